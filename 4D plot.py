@@ -1,20 +1,40 @@
+import time
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from scipy.interpolate import griddata
+
+from surface_grid import METHODS, SurfaceData
+from store_browser import ask_recording
+from table_loader import load_columns, read_header
+
+# Number of upcoming frames computed ahead of the playhead during playback
+PREFETCH_FRAMES = 8
 
 class SurfacePlotApp:
     def __init__(self, root):
         self.root = root
         self.root.title("3D Surface Plot Viewer")
-        self.df = None
+        self.file_path = None
+        self.surface = None
         self.animating = False
 
+        # Playback state: frames are interpolated by worker threads ahead of the playhead
+        self.frame_pool = ThreadPoolExecutor(max_workers=2)
+        self.pending_frames = {}
+        # Every submitted frame job not finished yet, including those whose frame was dropped
+        self.frame_jobs = []
+        self.frame_artist = None
+        self.background = None
+
         self.time_window = tk.DoubleVar(value=1.0)
+        self.frame_interval = tk.IntVar(value=300)
         self.cmap_choice = tk.StringVar(value='viridis')
+        self.interp_method = tk.StringVar(value='auto')
+        self.use_cache = tk.BooleanVar(value=False)
 
         self.x_col = tk.StringVar()
         self.y_col = tk.StringVar()
@@ -28,6 +48,8 @@ class SurfacePlotApp:
         top_frame.pack(pady=10)
 
         tk.Button(top_frame, text="📁 Load CSV", command=self.load_csv).grid(row=0, column=0, padx=5)
+        tk.Button(top_frame, text="🗄 Open from Store",
+                  command=self.load_from_store).grid(row=0, column=8, padx=5)
 
         ttk.Label(top_frame, text="Time Window (s):").grid(row=0, column=1)
         self.time_entry = tk.Entry(top_frame, textvariable=self.time_window, width=6)
@@ -38,6 +60,14 @@ class SurfacePlotApp:
                      values=['viridis', 'plasma', 'inferno', 'magma', 'cividis'],
                      width=10).grid(row=0, column=4)
 
+        ttk.Label(top_frame, text="Interpolation:").grid(row=0, column=5, padx=(10, 0))
+        method_box = ttk.Combobox(top_frame, textvariable=self.interp_method, values=list(METHODS),
+                                  state='readonly', width=9)
+        method_box.grid(row=0, column=6)
+        method_box.bind("<<ComboboxSelected>>", lambda e: self.on_method_change())
+
+        tk.Checkbutton(top_frame, text="Cache columns (Feather)", variable=self.use_cache).grid(row=0, column=7, padx=5)
+
         # Column selectors
         col_sel_frame = tk.Frame(self.root)
         col_sel_frame.pack(pady=5)
@@ -83,24 +113,36 @@ class SurfacePlotApp:
         tk.Button(ctrl_frame, text="⏹ Stop", command=self.stop_animation).pack(side=tk.LEFT, padx=10)
         tk.Button(ctrl_frame, text="💾 Export Plot", command=self.export_plot).pack(side=tk.LEFT, padx=10)
 
-    def load_csv(self):
-        file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+        ttk.Label(ctrl_frame, text="Frame interval (ms):").pack(side=tk.LEFT)
+        tk.Entry(ctrl_frame, textvariable=self.frame_interval, width=6).pack(side=tk.LEFT, padx=5)
+        self.fps_label = ttk.Label(ctrl_frame, text="")
+        self.fps_label.pack(side=tk.LEFT, padx=10)
+
+    def load_csv(self, file_path=None):
+        if file_path is None:
+            file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"),
+                                                              ("Parquet / Feather", "*.parquet *.feather")])
         if not file_path:
             return
 
         try:
-            self.df = pd.read_csv(file_path)
+            # Only the header for now; the four plotted columns are read on Apply Columns.
+            col_names = read_header(file_path)
         except Exception as e:
             messagebox.showerror("Error", f"Could not read CSV: {e}")
             return
+        self.file_path = file_path
+        self.surface = None
 
         # Update dropdowns
-        col_names = list(self.df.columns)
         for dropdown in [self.x_dropdown, self.y_dropdown, self.z_dropdown, self.time_dropdown]:
             dropdown['values'] = col_names
 
         if 'Time' in col_names:
             self.time_col.set('Time')
+        elif 'Timestamp' in col_names:
+            # Converted recordings (and the trace store) use the converter's time column name.
+            self.time_col.set('Timestamp')
         if 'X' in col_names:
             self.x_col.set('X')
         if 'Y' in col_names:
@@ -108,32 +150,83 @@ class SurfacePlotApp:
         if 'Z' in col_names:
             self.z_col.set('Z')
 
+    def load_from_store(self):
+        file_path = ask_recording(self.root)
+        if file_path:
+            self.load_csv(file_path)
+
     def on_column_selection(self):
-        if self.df is None:
+        if self.file_path is None:
             return
         try:
-            time_vals = self.df[self.time_col.get()].dropna()
-            self.min_time = float(time_vals.min())
-            self.max_time = float(time_vals.max())
+            columns = self.time_col.get(), self.x_col.get(), self.y_col.get(), self.z_col.get()
+            # Time stays float64: float32 cannot resolve sample steps on long or absolute time axes.
+            df = load_columns(self.file_path, columns, precise=(self.time_col.get(),),
+                              cache=self.use_cache.get())
+            # Sort by time once; every slider move is then just a slice of these arrays.
+            self.surface = SurfaceData(df, *columns, method=self.interp_method.get())
+            self.min_time = self.surface.min_time
+            self.max_time = self.surface.max_time
         except Exception as e:
-            messagebox.showerror("Invalid Column", f"Time column could not be read: {e}")
+            messagebox.showerror("Invalid Column", f"Columns could not be read: {e}")
             return
 
         self.slider.configure(from_=self.min_time, to=self.max_time - self.time_window.get(), resolution=0.1)
         self.slider.set(self.min_time)
         self.update_plot(self.min_time)
 
+    def on_method_change(self):
+        if self.surface is None:
+            return
+        self.surface.method = self.interp_method.get()
+        # Frames prefetched with the previous method are no longer what the user asked for.
+        self.cancel_pending_frames()
+        if not self.animating:
+            self.update_plot(self.slider.get())
+
+    def compute_frame(self, time_val, window):
+        """Works out what to draw for one time window. Touches no widgets, so worker threads can run it."""
+        # Scatter fallbacks draw a decimated window once it holds more than the point budget.
+        X, Y, Z = self.surface.window(time_val, window, self.surface.point_budget)
+
+        if len(X) < 3:
+            return "empty", None
+        if len(np.unique(X)) < 2 or len(np.unique(Y)) < 2:
+            # Insufficient variation in X or Y
+            return "scatter", (X, Y, Z)
+        if len(np.unique(Z)) < 2:
+            # Z is constant
+            return "flat", (X, Y, Z)
+        try:
+            xi, yi, zi = self.surface.grid(time_val, window)
+
+            if zi is None or np.all(np.isnan(zi)):
+                raise ValueError("Interpolation failed")
+
+            return "surface", (xi, yi, zi)
+        except Exception:
+            # Interpolation fallback
+            return "scatter", (X, Y, Z)
+
+    def draw_frame(self, kind, data, **kwargs):
+        """Adds the artist for a computed frame to the axes and returns it (None for an empty frame)."""
+        if kind == "surface":
+            return self.ax.plot_surface(*data, cmap=self.cmap_choice.get(), edgecolor='none', **kwargs)
+        if kind == "scatter":
+            X, Y, Z = data
+            return self.ax.scatter(X, Y, Z, c=Z, cmap=self.cmap_choice.get(), **kwargs)
+        if kind == "flat":
+            return self.ax.scatter(*data, c='blue', **kwargs)
+        return None
+
     def update_plot(self, time_val):
-        if self.df is None:
+        # During playback the slider is only a position readout; animate_plot does the drawing.
+        if self.surface is None or self.animating:
             return
         try:
             time_val = float(time_val)
             window = float(self.time_window.get())
-            df_window = self.df[
-                (self.df[self.time_col.get()] >= time_val) &
-                (self.df[self.time_col.get()] <= time_val + window)
-            ]
-            df_window = df_window.dropna(subset=[self.x_col.get(), self.y_col.get(), self.z_col.get()])
+            kind, data = self.compute_frame(time_val, window)
         except Exception as e:
             self.ax.clear()
             self.ax.set_title(f"Column error: {e}")
@@ -142,59 +235,132 @@ class SurfacePlotApp:
 
         self.ax.clear()
 
-        if len(df_window) < 3:
+        if kind == "empty":
             self.ax.set_title("Too few data points")
             self.canvas.draw()
             return
 
-        X = df_window[self.x_col.get()].values
-        Y = df_window[self.y_col.get()].values
-        Z = df_window[self.z_col.get()].values
-
-        if len(np.unique(X)) < 2 or len(np.unique(Y)) < 2:
-            self.ax.set_title("Insufficient variation in X or Y")
-            self.ax.scatter(X, Y, Z, c=Z, cmap=self.cmap_choice.get())
-        elif len(np.unique(Z)) < 2:
-            self.ax.set_title("Z is constant")
-            self.ax.scatter(X, Y, Z, c='blue')
-        else:
-            try:
-                xi = np.linspace(X.min(), X.max(), 100)
-                yi = np.linspace(Y.min(), Y.max(), 100)
-                xi, yi = np.meshgrid(xi, yi)
-                zi = griddata((X, Y), Z, (xi, yi), method='linear')
-
-                if zi is None or np.all(np.isnan(zi)):
-                    raise ValueError("Interpolation failed")
-
-                self.ax.plot_surface(xi, yi, zi, cmap=self.cmap_choice.get(), edgecolor='none')
-            except Exception as e:
-                self.ax.set_title(f"Interpolation fallback: {e}")
-                self.ax.scatter(X, Y, Z, c=Z, cmap=self.cmap_choice.get())
+        self.draw_frame(kind, data)
 
         self.ax.set_title(f"{time_val:.2f} – {time_val + window:.2f} sec")
-        self.ax.set_xlabel(self.x_col.get())
-        self.ax.set_ylabel(self.y_col.get())
-        self.ax.set_zlabel(self.z_col.get())
+        self.set_axis_labels()
         self.canvas.draw()
 
+    def set_axis_labels(self):
+        _, x_col, y_col, z_col = self.surface.columns
+        self.ax.set_xlabel(x_col)
+        self.ax.set_ylabel(y_col)
+        self.ax.set_zlabel(z_col)
+
     def start_animation(self):
+        if self.surface is None or self.animating:
+            return
         self.animating = True
+
+        self.play_window = float(self.time_window.get())
+        self.play_start = float(self.slider['from'])
+        self.play_step = float(self.slider['resolution'])
+        self.play_frames = max(1, int(round((float(self.slider['to']) - self.play_start) / self.play_step)) + 1)
+        self.play_index = int(round((float(self.slider.get()) - self.play_start) / self.play_step))
+        self.cancel_pending_frames()
+        self.drawn_times = deque(maxlen=20)
+        self.dropped_frames = 0
+
+        # Fixed limits keep the projection constant, so everything except the frame artist
+        # and its label can be drawn once and blitted back for each frame.
+        self.ax.clear()
+        with np.errstate(all='ignore'):
+            for set_lim, values in ((self.ax.set_xlim, self.surface.x), (self.ax.set_ylim, self.surface.y),
+                                    (self.ax.set_zlim, self.surface.z)):
+                lo, hi = np.nanmin(values), np.nanmax(values)
+                if np.isfinite(lo) and np.isfinite(hi) and lo < hi:
+                    set_lim(lo, hi)
+        self.set_axis_labels()
+        self.frame_artist = None
+        self.frame_label = self.ax.text2D(0.02, 0.95, "", transform=self.ax.transAxes, animated=True)
+        self.draw_cid = self.canvas.mpl_connect('draw_event', self.on_canvas_draw)
+        self.canvas.draw()
+
         self.animate_plot()
 
     def stop_animation(self):
+        if not self.animating:
+            return
         self.animating = False
+        self.canvas.mpl_disconnect(self.draw_cid)
+        self.cancel_pending_frames()
+        self.frame_artist = None
+        self.update_plot(self.slider.get())
+
+    def frame_time(self, index):
+        return round(self.play_start + index * self.play_step, 9)
+
+    def cancel_pending_frames(self):
+        for future in self.pending_frames.values():
+            future.cancel()
+        self.pending_frames = {}
+
+    def prefetch_frames(self):
+        # Jobs still running for dropped frames count too, so a slow interpolation cannot
+        # pile up work faster than the workers get through it.
+        self.frame_jobs = [future for future in self.frame_jobs if not future.done()]
+        for offset in range(PREFETCH_FRAMES):
+            if len(self.frame_jobs) >= PREFETCH_FRAMES:
+                break
+            index = (self.play_index + offset) % self.play_frames
+            if index not in self.pending_frames:
+                future = self.frame_pool.submit(self.compute_frame, self.frame_time(index), self.play_window)
+                self.pending_frames[index] = future
+                self.frame_jobs.append(future)
 
     def animate_plot(self):
         if not self.animating:
             return
-        current = self.slider.get()
-        step = self.slider['resolution']
-        new_time = current + step
-        if new_time > float(self.slider['to']):
-            new_time = float(self.slider['from'])  # loop
-        self.slider.set(new_time)
-        self.root.after(300, self.animate_plot)
+
+        self.play_index = (self.play_index + 1) % self.play_frames  # loop
+        time_val = self.frame_time(self.play_index)
+        self.slider.set(time_val)
+        self.prefetch_frames()
+
+        # Never wait for a frame: if its worker has not finished, drop it and move on.
+        future = self.pending_frames.pop(self.play_index, None)
+        if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+            kind, data = future.result()
+            if self.frame_artist is not None:
+                self.frame_artist.remove()
+            self.frame_artist = self.draw_frame(kind, data, animated=True)
+            if kind == "empty":
+                self.frame_label.set_text("Too few data points")
+            else:
+                self.frame_label.set_text(f"{time_val:.2f} – {time_val + self.play_window:.2f} sec")
+            self.blit_frame()
+            self.drawn_times.append(time.perf_counter())
+        else:
+            if future is not None:
+                future.cancel()
+            self.dropped_frames += 1
+
+        if len(self.drawn_times) > 1:
+            fps = (len(self.drawn_times) - 1) / (self.drawn_times[-1] - self.drawn_times[0])
+            self.fps_label.config(text=f"{fps:.1f} fps, {self.dropped_frames} dropped")
+
+        self.root.after(max(1, int(self.frame_interval.get())), self.animate_plot)
+
+    def on_canvas_draw(self, event):
+        # A full redraw (first frame, resize, rotating the view) renders everything but the
+        # animated artists; keep that as the background and put the current frame back on top.
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.blit_frame()
+
+    def blit_frame(self):
+        if self.background is None:
+            return
+        self.canvas.restore_region(self.background)
+        if self.frame_artist is not None:
+            self.frame_artist.do_3d_projection()
+            self.ax.draw_artist(self.frame_artist)
+        self.ax.draw_artist(self.frame_label)
+        self.canvas.blit(self.fig.bbox)
 
     def export_plot(self):
         filename = filedialog.asksaveasfilename(defaultextension=".png",
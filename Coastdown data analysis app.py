@@ -2,38 +2,68 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import pandas as pd
 import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 import numpy as np
 import difflib
 
+from coastdown import FILTERS, SmoothedForce, SpanFit, analyze_trace, envelope, fit_span, pair_summary
+from data_table import DataTable
+from store_browser import ask_recording
+from table_loader import load_columns, read_header
+
+# Point pairs of the span plot's speed envelope, and the shortest time between marker redraws
+ENVELOPE_BINS = 2000
+MOTION_INTERVAL_MS = 15
+
 df = pd.DataFrame()
 speed_col, accel_col = None, None
+# Smoothing/force cache of the loaded acceleration column
+smoothed_force = None
+# Loaded file and its header: stripped column name -> name in the file
+data_file, file_columns = None, {}
 
 # -------------------------------------------
 def get_best_match(target, available_columns):
     match = difflib.get_close_matches(target.lower(), available_columns, n=1, cutoff=0.6)
     return match[0] if match else None
 
-def load_csv():
-    global df, speed_col, accel_col
-    file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+def read_columns(columns, float32=True):
+    """Reads the given (stripped) columns of the loaded file, leaving every other column on disk."""
+    frame = load_columns(data_file, [file_columns[col] for col in columns], float32=float32, cache=cache_var.get())
+    frame.columns = columns
+    return frame
+
+def ensure_columns(*columns, float32=True):
+    """Adds file columns that are not loaded yet to df (calculated columns are already there)."""
+    global df
+    missing = [col for col in dict.fromkeys(columns) if col not in df.columns and col in file_columns]
+    if missing:
+        df = pd.concat([df, read_columns(missing, float32)], axis=1)
+
+def load_csv(file_path=None):
+    global df, speed_col, accel_col, data_file, file_columns, smoothed_force
+    if file_path is None:
+        file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("Parquet / Feather", "*.parquet *.feather")])
     if not file_path:
         return
     try:
-        df_raw = pd.read_csv(file_path, encoding="utf-8", engine="python")
-        df_raw.columns = [col.strip() for col in df_raw.columns]
-        columns_lower = [col.lower() for col in df_raw.columns]
+        # Match columns on the header alone; only the matched columns are parsed.
+        header = read_header(file_path)
+        stripped = [col.strip() for col in header]
+        columns_lower = [col.lower() for col in stripped]
 
         speed_col_match = get_best_match("Speed (km/h)", columns_lower)
         accel_col_match = get_best_match("Longitudinal acceleration (g)", columns_lower)
 
         if not speed_col_match or not accel_col_match:
-            messagebox.showerror("Missing Columns", f"Required columns not found.\nAvailable: {df_raw.columns.tolist()}")
+            messagebox.showerror("Missing Columns", f"Required columns not found.\nAvailable: {stripped}")
             return
 
-        speed_col = df_raw.columns[columns_lower.index(speed_col_match)]
-        accel_col = df_raw.columns[columns_lower.index(accel_col_match)]
-        df = df_raw.copy()
+        speed_col = stripped[columns_lower.index(speed_col_match)]
+        accel_col = stripped[columns_lower.index(accel_col_match)]
+        data_file, file_columns = file_path, dict(zip(stripped, header))
+        df = read_columns([speed_col, accel_col])
+        smoothed_force = SmoothedForce(df[accel_col].values)
 
         messagebox.showinfo("Success", f"Loaded {len(df)} rows.\nMatched columns:\n- Speed: {speed_col}\n- Accel: {accel_col}")
         update_table()
@@ -41,48 +71,59 @@ def load_csv():
     except Exception as e:
         messagebox.showerror("Read Error", str(e))
 
+def load_from_store():
+    file_path = ask_recording(root)
+    if file_path:
+        load_csv(file_path)
+
 def update_table():
     if df.empty:
         return
-    for widget in table_frame.winfo_children():
-        widget.destroy()
-    tree = ttk.Treeview(table_frame)
-    tree.pack(fill="both", expand=True)
-    tree["columns"] = list(df.columns)
-    tree["show"] = "headings"
-    for col in df.columns:
-        tree.heading(col, text=col)
-        tree.column(col, width=100)
-    for _, row in df.head(100).iterrows():
-        tree.insert("", "end", values=list(row))
+    data_table.show(df)
 
 def update_dropdowns():
     if df.empty:
         return
-    cols = df.columns.tolist()
+    # Every column of the file can be picked; plot_graph loads it on first use.
+    cols = df.columns.tolist() + [col for col in file_columns if col not in df.columns]
     x_dropdown['values'] = cols
     y_dropdown['values'] = cols
 
+def recalculate():
+    """Updates the smoothed acceleration and force columns from the current settings."""
+    window = int(window_entry.get())
+    if window < 1:
+        raise ValueError("The smoothing window must be at least 1 sample.")
+    total_mass = float(vehicle_weight_entry.get()) + float(rider_weight_entry.get())
+    method = filter_var.get()
+
+    # Only a new filter or window filters the trace again; a new mass just rescales it.
+    df["Smoothed Acceleration (g)"] = smoothed_force.smoothed(window, method)
+    df["Force (N)"] = smoothed_force.force(window, total_mass, method)
+
+    update_table()
+    update_dropdowns()
+
 def smooth_and_calculate():
-    global df
     if df.empty:
         messagebox.showwarning("No Data", "Please load a CSV file first.")
         return
     try:
-        window = int(window_entry.get())
-        vehicle_wt = float(vehicle_weight_entry.get())
-        rider_wt = float(rider_weight_entry.get())
-        total_mass = vehicle_wt + rider_wt
-
-        df["Smoothed Acceleration (g)"] = df[accel_col].rolling(window=window, min_periods=1, center=True).mean()
-        df["Force (N)"] = total_mass * 9.81 * df["Smoothed Acceleration (g)"]
-
-        update_table()
-        update_dropdowns()
+        recalculate()
         messagebox.showinfo("Done", "Smoothing and force calculation completed.")
     except Exception as e:
         messagebox.showerror("Error", str(e))
 
+def on_parameter_change(event=None):
+    """Recalculates as parameters are edited, once Smooth & Calculate has been run."""
+    if df.empty or "Force (N)" not in df.columns:
+        return
+    try:
+        recalculate()
+    except ValueError:
+        # Half-typed numbers: keep the last result until the entry is valid again.
+        pass
+
 def plot_graph():
     global df
     if df.empty:
@@ -94,6 +135,8 @@ def plot_graph():
         messagebox.showwarning("Select Columns", "Please select both X and Y axis columns.")
         return
     try:
+        # Any column can be picked, a long time axis among them, which float32 would quantise.
+        ensure_columns(x_col, y_col, float32=False)
         plt.figure(figsize=(10, 5))
         plt.plot(df[x_col], df[y_col], label=f"{y_col} vs {x_col}")
         plt.xlabel(x_col)
@@ -106,6 +149,40 @@ def plot_graph():
     except Exception as e:
         messagebox.showerror("Plot Error", str(e))
 
+# ------------------ Automatic segments ----------------
+def auto_fit_segments():
+    if df.empty:
+        messagebox.showwarning("No Data", "Please load a CSV file first.")
+        return
+    try:
+        window = int(window_entry.get())
+        total_mass = float(vehicle_weight_entry.get()) + float(rider_weight_entry.get())
+        # Runs must be throttle-off when the file logs a throttle channel.
+        throttle_col = next((col for col in file_columns if "throttle" in col.lower()), None)
+        throttle = None
+        if throttle_col:
+            ensure_columns(throttle_col)
+            throttle = df[throttle_col].values
+        segments = analyze_trace(df[speed_col].values, df[accel_col].values, total_mass,
+                                 throttle=throttle, smoothing=window)
+    except Exception as e:
+        messagebox.showerror("Error", str(e))
+        return
+    if segments.empty:
+        messagebox.showinfo("No Segments", "No coastdown runs were found in this file.")
+        return
+
+    result_window = tk.Toplevel()
+    result_window.title("Detected Coastdown Runs")
+    pairs = pair_summary(segments)
+    summary = f"{len(segments)} runs, {len(pairs)} pairs"
+    if len(pairs):
+        summary += f"\nMean of pairs: A = {pairs['A'].mean():.2f} N, C = {pairs['C'].mean():.4f} N/(km/h)^2"
+    tk.Label(result_window, text=summary, font=("Arial", 12), justify="left").pack(pady=5)
+    table = DataTable(result_window)
+    table.pack(fill="both", expand=True)
+    table.show(segments)
+
 # ------------------ Span Plot -------------------------
 def show_speed_plot_with_selector():
     if df.empty or "Force (N)" not in df.columns:
@@ -117,50 +194,85 @@ def show_speed_plot_with_selector():
 
     fig, ax = plt.subplots(figsize=(10, 4))
     canvas = FigureCanvasTkAgg(fig, master=span_window)
+    toolbar = NavigationToolbar2Tk(canvas, span_window)
     canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-    time = np.arange(len(df))  # x-axis as index
     speed = df[speed_col].values
-    ax.plot(time, speed, label="Speed (km/h)")
+    span_fit = SpanFit(speed, df["Force (N)"].values)
+    # Long traces are drawn as a min/max envelope of about one point pair per pixel,
+    # recomputed for the visible range whenever the view is zoomed or panned.
+    trace, = ax.plot(*envelope(speed, 0, len(speed), ENVELOPE_BINS), label="Speed (km/h)")
+    ax.set_xlim(0, max(len(speed) - 1, 1))
     ax.set_xlabel("Time index")
     ax.set_ylabel("Speed (km/h)")
     ax.set_title("Speed vs Time")
     ax.grid(True)
 
-    line1 = ax.axvline(x=100, color='red', label="Point 1", linestyle='--')
-    line2 = ax.axvline(x=200, color='blue', label="Point 2", linestyle='--')
-    speed_text = ax.text(0.01, 0.95, '', transform=ax.transAxes, fontsize=10, verticalalignment='top')
+    # Markers and readout are animated: dragging redraws only them over a cached background.
+    line1 = ax.axvline(x=100, color='red', label="Point 1", linestyle='--', animated=True)
+    line2 = ax.axvline(x=200, color='blue', label="Point 2", linestyle='--', animated=True)
+    speed_text = ax.text(0.01, 0.95, '', transform=ax.transAxes, fontsize=10, verticalalignment='top',
+                         animated=True)
+    state = {'background': None, 'selected': None, 'pending': None}
 
     def update_text():
         i1, i2 = int(line1.get_xdata()[0]), int(line2.get_xdata()[0])
         i1, i2 = sorted([max(0, i1), min(len(df) - 1, i2)])
         s1, s2 = speed[i1], speed[i2]
-        speed_text.set_text(f"Speed 1: {s1:.2f} km/h\nSpeed 2: {s2:.2f} km/h")
-        fig.canvas.draw_idle()
+        A, C, _ = span_fit.fit(i1, i2)
+        speed_text.set_text(f"Speed 1: {s1:.2f} km/h\nSpeed 2: {s2:.2f} km/h\n"
+                            f"Preview: A = {A:.2f} N, C = {C:.4f} N/(km/h)^2")
+
+    def blit():
+        if state['background'] is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(state['background'])
+        for artist in (line1, line2, speed_text):
+            ax.draw_artist(artist)
+        canvas.blit(fig.bbox)
+
+    def on_draw(event):
+        state['background'] = canvas.copy_from_bbox(fig.bbox)
+        for artist in (line1, line2, speed_text):
+            ax.draw_artist(artist)
+
+    def on_xlim_changed(axes):
+        lo, hi = axes.get_xlim()
+        trace.set_data(*envelope(speed, np.floor(lo), np.ceil(hi) + 1, ENVELOPE_BINS))
+        canvas.draw_idle()
 
     def on_click(event):
-        if event.inaxes != ax:
+        if event.inaxes != ax or toolbar.mode:
             return
         if abs(event.xdata - line1.get_xdata()[0]) < abs(event.xdata - line2.get_xdata()[0]):
-            on_click.selected = 1
+            state['selected'] = line1
         else:
-            on_click.selected = 2
+            state['selected'] = line2
+
+    def flush_motion():
+        line, x = state['pending']
+        state['pending'] = None
+        line.set_xdata([x])
+        update_text()
+        blit()
 
     def on_motion(event):
-        if not hasattr(on_click, "selected") or event.inaxes != ax:
+        if state['selected'] is None or event.inaxes != ax:
             return
-        if on_click.selected == 1:
-            line1.set_xdata([event.xdata])
-        elif on_click.selected == 2:
-            line2.set_xdata([event.xdata])
-        update_text()
+        # Motion events arrive far faster than the screen refreshes; redraw at most once per frame.
+        if state['pending'] is None:
+            span_window.after(MOTION_INTERVAL_MS, flush_motion)
+        state['pending'] = state['selected'], event.xdata
 
     def on_release(event):
-        on_click.selected = None
+        state['selected'] = None
 
+    fig.canvas.mpl_connect("draw_event", on_draw)
     fig.canvas.mpl_connect("button_press_event", on_click)
     fig.canvas.mpl_connect("motion_notify_event", on_motion)
     fig.canvas.mpl_connect("button_release_event", on_release)
+    ax.callbacks.connect("xlim_changed", on_xlim_changed)
 
     update_text()
 
@@ -174,12 +286,7 @@ def show_speed_plot_with_selector():
     def fit_force_curve():
         i1, i2 = int(line1.get_xdata()[0]), int(line2.get_xdata()[0])
         i1, i2 = sorted([max(0, i1), min(len(df) - 1, i2)])
-        v = df[speed_col].iloc[i1:i2+1].values
-        f = df["Force (N)"].iloc[i1:i2+1].values
-
-        v_squared = v**2
-        coeffs = np.polyfit(v_squared, f, 1)
-        C, A = coeffs[0], coeffs[1]
+        A, C = fit_span(df[speed_col].values, df["Force (N)"].values, i1, i2)
 
         result = f"A = {A:.2f} N\nC = {C:.4f} N/(km/h)^2"
         result_label.config(text=result)
@@ -203,12 +310,16 @@ frame = tk.Frame(root)
 frame.pack(padx=10, pady=10)
 
 tk.Button(frame, text="Load CSV", command=load_csv).grid(row=0, column=0, padx=5)
+tk.Button(frame, text="Open from Store", command=load_from_store).grid(row=0, column=4, padx=5)
 
 tk.Label(frame, text="Moving Avg Window:").grid(row=0, column=1)
 window_entry = tk.Entry(frame, width=5)
 window_entry.insert(0, "5")
 window_entry.grid(row=0, column=2, padx=5)
 
+cache_var = tk.BooleanVar(value=False)
+tk.Checkbutton(frame, text="Cache columns (Feather)", variable=cache_var).grid(row=0, column=3, padx=5)
+
 tk.Label(frame, text="Vehicle Weight (kg):").grid(row=1, column=0)
 vehicle_weight_entry = tk.Entry(frame, width=10)
 vehicle_weight_entry.insert(0, "100")
@@ -219,6 +330,14 @@ rider_weight_entry = tk.Entry(frame, width=10)
 rider_weight_entry.insert(0, "70")
 rider_weight_entry.grid(row=1, column=3)
 
+tk.Label(frame, text="Filter:").grid(row=1, column=4)
+filter_var = tk.StringVar(value=FILTERS[0])
+filter_box = ttk.Combobox(frame, textvariable=filter_var, values=list(FILTERS), state="readonly", width=14)
+filter_box.grid(row=1, column=5, padx=5)
+filter_box.bind("<<ComboboxSelected>>", on_parameter_change)
+for entry in (window_entry, vehicle_weight_entry, rider_weight_entry):
+    entry.bind("<KeyRelease>", on_parameter_change)
+
 tk.Label(frame, text="X-Axis:").grid(row=2, column=0)
 x_dropdown = ttk.Combobox(frame, state="readonly")
 x_dropdown.grid(row=2, column=1)
@@ -229,9 +348,11 @@ y_dropdown.grid(row=2, column=3)
 
 tk.Button(frame, text="Smooth & Calculate", command=smooth_and_calculate).grid(row=3, column=0, columnspan=2, pady=10)
 tk.Button(frame, text="Plot Graph", command=plot_graph).grid(row=3, column=2, columnspan=2)
-tk.Button(frame, text="Speed-Time Selector", command=show_speed_plot_with_selector).grid(row=4, column=0, columnspan=4, pady=10)
+tk.Button(frame, text="Speed-Time Selector", command=show_speed_plot_with_selector).grid(row=4, column=0, columnspan=2, pady=10)
+tk.Button(frame, text="Auto-detect Runs", command=auto_fit_segments).grid(row=4, column=2, columnspan=2)
 
-table_frame = tk.Frame(root)
-table_frame.pack(fill="both", expand=True)
+# Every row of the file can be browsed; only the visible page is rendered.
+data_table = DataTable(root)
+data_table.pack(fill="both", expand=True)
 
 root.mainloop()
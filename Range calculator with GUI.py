@@ -1,19 +1,18 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
-import pandas as pd
-import numpy as np
-from scipy.interpolate import interp1d # type: ignore
-import matplotlib.pyplot as plt
-from io import BytesIO
+from tkinter import filedialog, messagebox, ttk
 
-# 📝 Make sure to include this import for ExcelWriter!
-from pandas import ExcelWriter
+from range_energy import calculate_energy, load_cycle, load_workbook, write_report
 
 def browse_file():
     file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx")])
     file_entry.delete(0, tk.END)
     file_entry.insert(0, file_path)
 
+def browse_cycle():
+    file_path = filedialog.askopenfilename(filetypes=[("Recordings", "*.feather *.parquet *.csv")])
+    cycle_entry.delete(0, tk.END)
+    cycle_entry.insert(0, file_path)
+
 def calculate():
     try:
         file_path = file_entry.get()
@@ -25,79 +24,20 @@ def calculate():
         battery_capacity = float(entry_battery.get())
         raster = float(entry_raster.get())
 
-        # Load data
-        data = pd.read_excel(file_path, sheet_name='Sheet1')
-        eff_table = pd.read_excel(file_path, sheet_name='Sheet3')
-
-        # Efficiency curve
-        speed_curve = eff_table.iloc[1:, 0].dropna().values.astype(float)
-        efficiency_curve = eff_table.iloc[1:, 1].dropna().values.astype(float)
-        efficiency_interp = interp1d(speed_curve, efficiency_curve, kind='linear', fill_value="extrapolate")
-
-        df = data.copy()
-        df['Speed_dyno_m/s'] = df['Speed_dyno'] / 3.6
-        df['dv/dt'] = np.gradient(df['Speed_dyno_m/s'], df['timestamps'])
-        df['dv/dt'] = df['dv/dt'].shift(1).fillna(0)
-
-        m = vehicle_wt + rider_wt
-        df['F'] = a + b * df['Speed_dyno'] + c * (df['Speed_dyno'] ** 2) + m * df['dv/dt']
-        df['P'] = df['F'] * df['Speed_dyno_m/s']
-        df['Efficiency'] = df['Speed_dyno'].apply(lambda v: efficiency_interp(v))
-
-        def calculate_p_corrected(row):
-            if row['timestamps'] < 700:
-                return abs(row['P']) / row['Efficiency']
-            else:
-                if row['P'] < 0:
-                    return row['P'] * row['Efficiency']
-                elif row['P'] == 0:
-                    return 32
-                else:
-                    return row['P'] / row['Efficiency']
-
-        df['P_corrected'] = df.apply(calculate_p_corrected, axis=1)
-
-        integral_P_corrected = np.trapz(df['P_corrected'], df['timestamps'])
-        Wh = integral_P_corrected / 3600
-        distance = np.trapz(df['Speed_dyno_m/s'], df['timestamps'])
-        WhperKm = Wh / (distance / 1000)
-        range_km = battery_capacity / WhperKm
-
-        # Create Speed vs Force plot
-        speeds = np.linspace(df['Speed_dyno'].min(), df['Speed_dyno'].max(), 100)
-        forces = a + b * speeds + c * (speeds ** 2)
-
-        plt.figure(figsize=(8, 5))
-        plt.plot(speeds, forces, color='blue', linewidth=2)
-        plt.xlabel("Speed (km/h)")
-        plt.ylabel("Force (N)")
-        plt.title("Speed vs Force Curve")
-        plt.grid(True)
-
-        imgdata = BytesIO()
-        plt.savefig(imgdata, format='png')
-        plt.close()
-        imgdata.seek(0)
+        # Load data (parsed sheets are cached until the workbook changes)
+        data, eff_table = load_workbook(file_path, sidecar_var.get())
+        if cycle_entry.get():
+            # Drive cycle straight from a recording; the workbook still supplies the efficiency table.
+            data = load_cycle(cycle_entry.get(), speed_col_entry.get())
+
+        df, results = calculate_energy(data, eff_table, a, b, c, vehicle_wt, rider_wt, battery_capacity)
+        WhperKm, range_km = results['WhperKm'], results['range_km']
 
         output_file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
         if output_file_path:
-            with ExcelWriter(output_file_path, engine='xlsxwriter') as writer:
-                df.to_excel(writer, sheet_name='Processed Data', index=False)
-
-                summary_data = pd.DataFrame({
-                    'Metric': ['Total Energy Consumption (Wh)',
-                               'Total Distance (m)',
-                               'Energy Consumption (Wh/km)',
-                               'Estimated Range (km)'],
-                    'Value': [Wh, distance, WhperKm, range_km]
-                })
-                summary_data.to_excel(writer, sheet_name='Summary', index=False, startrow=0)
-
-                workbook = writer.book
-                worksheet = writer.sheets['Summary']
-                worksheet.insert_image('D6', 'speed_force_plot.png', {'image_data': imgdata})
-
-            messagebox.showinfo("Success", f"Calculation complete.\n\nEstimated Range: {range_km:.2f} km\nEnergy Consumption: {WhperKm:.2f} Wh/km\n\nFile saved: {output_file_path}")
+            samples_path = write_report(output_file_path, df, results, a, b, c, samples_format_var.get())
+
+            messagebox.showinfo("Success", f"Calculation complete.\n\nEstimated Range: {range_km:.2f} km\nEnergy Consumption: {WhperKm:.2f} Wh/km\n\nFile saved: {output_file_path}\nPer-sample data: {samples_path}")
         else:
             messagebox.showinfo("Cancelled", "Save cancelled, but calculation complete.")
 
@@ -147,6 +87,24 @@ entry_raster = tk.Entry(root)
 entry_raster.insert(0, "1")
 entry_raster.grid(row=7, column=1)
 
-tk.Button(root, text="Calculate & Save", command=calculate, bg="green", fg="white").grid(row=8, column=1, pady=10)
+tk.Label(root, text="Per-sample data:").grid(row=8, column=0, sticky="w")
+samples_format_var = tk.StringVar(value="Excel sheet")
+ttk.Combobox(root, textvariable=samples_format_var, state="readonly",
+             values=["Excel sheet", "Parquet file", "CSV file"]).grid(row=8, column=1)
+
+sidecar_var = tk.BooleanVar(value=False)
+tk.Checkbutton(root, text="Cache parsed workbook as Parquet sidecar", variable=sidecar_var).grid(row=9, column=1, sticky="w")
+
+tk.Label(root, text="Cycle recording (optional):").grid(row=10, column=0, sticky="w")
+cycle_entry = tk.Entry(root, width=50)
+cycle_entry.grid(row=10, column=1)
+tk.Button(root, text="Browse", command=browse_cycle).grid(row=10, column=2)
+
+tk.Label(root, text="Recording speed column:").grid(row=11, column=0, sticky="w")
+speed_col_entry = tk.Entry(root)
+speed_col_entry.insert(0, "Speed")
+speed_col_entry.grid(row=11, column=1)
+
+tk.Button(root, text="Calculate & Save", command=calculate, bg="green", fg="white").grid(row=12, column=1, pady=10)
 
 root.mainloop()
@@ -0,0 +1,45 @@
+"""Single command-line entry point for the headless side of every tool.
+
+    python analysis_cli.py convert   logs/ --dbc vehicle.dbc --output csv/
+    python analysis_cli.py range     cycles/ --vehicle-wt 138 --rider-wt 75 90
+    python analysis_cli.py coastdown runs/ --vehicle-wt 100 --rider-wt 70
+    python analysis_cli.py surface   trace.csv --columns Time X Y Z --window 1.0
+    python analysis_cli.py store     list store/
+
+Each command is the main() of the module behind the matching GUI. Only the
+module of the chosen command is imported, and none of them imports tkinter or
+pyplot, so batch jobs start quickly and run without a display.
+"""
+import importlib
+import sys
+
+COMMANDS = {
+    'convert': ('mf4_converter', "decode, resample and export MF4 recordings"),
+    'range': ('range_energy', "batch energy consumption and range calculation"),
+    'coastdown': ('coastdown', "detect and fit coastdown runs"),
+    'surface': ('surface_grid', "interpolate time-windowed X/Y/Z surfaces"),
+    'store': ('trace_store', "list the recordings of a trace store"),
+}
+
+
+def usage():
+    lines = [f"usage: {sys.argv[0]} <command> [options]", "", "commands:"]
+    lines += [f"  {name:<10} {description}" for name, (_, description) in COMMANDS.items()]
+    lines += ["", "Run a command with --help for its options."]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+    if not argv or argv[0] not in COMMANDS:
+        print(usage(), file=sys.stderr)
+        return 2
+    module = importlib.import_module(COMMANDS[argv[0]][0])
+    return module.main(argv[1:])
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,33 @@
+"""Helpers shared by the headless batch commands of range_energy and coastdown.
+
+Both expand folders into input files, evaluate each file in a worker process
+that returns an error row instead of raising, and collect one result table.
+"""
+import glob
+import os
+
+
+def expand_paths(paths, pattern):
+    """Expands folders to the files matching pattern they contain, leaving file paths as they are."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            files.append(path)
+    return files
+
+
+def errors_last(table):
+    """Moves the error column of a result table (filled in for the inputs that failed) to the end."""
+    if 'error' not in table.columns:
+        return table
+    return table[[column for column in table.columns if column != 'error'] + ['error']]
+
+
+def report_errors(table, input_column):
+    """Prints the error of every failed input in a result table and returns how many rows failed."""
+    failed = table.dropna(subset=['error']) if 'error' in table.columns else table.iloc[:0]
+    for input_path, error in zip(failed[input_column], failed['error']):
+        print(f"Error processing {input_path}: {error}")
+    return len(failed)
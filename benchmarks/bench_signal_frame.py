@@ -0,0 +1,78 @@
+"""Compares the old per-signal outer-merge export with mf4_converter.signals_to_frame.
+
+Builds in-memory MDFs with 50/200/1000 signals, resamples them the way process_mf4
+does and times both DataFrame builders on the result.
+
+    python benchmarks/bench_signal_frame.py [--duration 600] [--raster 0.1]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from asammdf import MDF, Signal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mf4_converter import signals_to_frame  # noqa: E402
+
+
+def merge_loop(signals):
+    """The original process_mf4 builder: one outer merge per signal."""
+    all_signals_df = pd.DataFrame()
+    for signal in signals:
+        signal_name = signal.name
+        signal_data = pd.DataFrame({
+            'Timestamp': signal.timestamps,
+            signal_name: signal.samples
+        })
+        if all_signals_df.empty:
+            all_signals_df = signal_data
+        else:
+            all_signals_df = pd.merge(all_signals_df, signal_data, on='Timestamp', how='outer')
+    return all_signals_df
+
+
+def make_mdf(n_signals, duration, rate=100.0, seed=0):
+    rng = np.random.default_rng(seed)
+    mdf = MDF(version="4.10")
+    # Several channel groups with their own jittered time bases, like decoded CAN messages.
+    per_group = 10
+    for start in range(0, n_signals, per_group):
+        n = int(duration * rate)
+        timestamps = np.sort(rng.uniform(0, duration, n))
+        signals = [Signal(rng.normal(size=n), timestamps, name=f"Signal_{i}")
+                   for i in range(start, min(start + per_group, n_signals))]
+        mdf.append(signals, common_timebase=True)
+    return mdf
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=600.0, help="recording length in seconds")
+    parser.add_argument("--raster", type=float, default=0.1, help="resampling raster in seconds")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000])
+    args = parser.parse_args()
+
+    print(f"{'signals':>8} {'rows':>8} {'merge loop (s)':>15} {'columnar (s)':>13} {'speed-up':>9}")
+    for n_signals in args.sizes:
+        resampled = make_mdf(n_signals, args.duration).resample(raster=args.raster)
+        signals = list(resampled)
+
+        merge_time, merged = time_call(merge_loop, signals)
+        frame_time, frame = time_call(signals_to_frame, signals)
+        assert np.allclose(merged.to_numpy(), frame.to_numpy(), equal_nan=True)
+
+        print(f"{n_signals:>8} {len(frame):>8} {merge_time:>15.3f} {frame_time:>13.3f} "
+              f"{merge_time / frame_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
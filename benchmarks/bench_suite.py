@@ -0,0 +1,217 @@
+"""Times the hot paths of every tool on synthetic fixtures and reports them as JSON lines.
+
+Fixtures (see fixtures.py) are generated once per size into --fixtures and
+reused by later runs. Each benchmark is run --repeat times for the best wall
+time, then once more under tracemalloc for the peak memory it allocates.
+Every result is one JSON object per line, so runs can be appended to one file
+and compared across commits:
+
+    python benchmarks/bench_suite.py --sizes small medium --output results.jsonl
+
+Benchmarks (the GUI callbacks are timed through the functions they call):
+
+* mf4_convert      - process_mf4 on a CAN bus logging MF4, CSV output
+* range_load       - load_workbook of a drive-cycle workbook (parse, no cache)
+* range_physics    - calculate_energy on the loaded cycle
+* coastdown_smooth - loading the columns, smooth_and_calculate and fit_force_curve
+* coastdown_detect - automatic run detection and fitting on the whole trace
+* surface_frames   - loading the columns, SurfaceData and update_plot's grid per frame
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fixtures  # noqa: E402
+
+# Rows (or recording seconds for mf4_convert) per size preset
+SIZES = {
+    'small': {'mf4_convert': 60, 'range': 10_000, 'coastdown': 100_000, 'surface': 100_000},
+    'medium': {'mf4_convert': 600, 'range': 100_000, 'coastdown': 1_000_000, 'surface': 1_000_000},
+    'large': {'mf4_convert': 3600, 'range': 1_000_000, 'coastdown': 10_000_000, 'surface': 5_000_000},
+}
+SURFACE_FRAMES = 50
+
+
+def fixture(directory, name, write, *args):
+    """Path of a fixture file, writing it first if it does not exist yet."""
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        # Written under a temporary name, so an interrupted run never leaves a truncated fixture.
+        root, extension = os.path.splitext(path)
+        write(f"{root}.partial{extension}", *args)
+        os.replace(f"{root}.partial{extension}", path)
+    return path
+
+
+def mf4_convert(directory, seconds):
+    from mf4_converter import process_mf4
+
+    dbc = fixture(directory, "bus.dbc", fixtures.write_dbc)
+    mf4 = fixture(directory, f"bus_{seconds}s.mf4", fixtures.write_can_mf4, seconds)
+
+    def run():
+        # A fresh output folder each time, so the manifest never skips the file.
+        output = tempfile.mkdtemp(dir=directory)
+        try:
+            status = process_mf4(mf4, dbc, output, 0.1, directory, log=lambda message: None)
+        finally:
+            shutil.rmtree(output, ignore_errors=True)
+        if status != "converted":
+            raise RuntimeError(f"process_mf4 returned {status}")
+
+    return run, int(seconds / 0.1), os.path.getsize(mf4)
+
+
+def range_load(directory, rows):
+    import range_energy
+
+    workbook = fixture(directory, f"cycle_{rows}.xlsx", fixtures.write_drive_cycle, rows)
+
+    def run():
+        range_energy._workbook_cache.clear()
+        range_energy.load_workbook(workbook)
+
+    return run, rows, os.path.getsize(workbook)
+
+
+def range_physics(directory, rows):
+    from range_energy import calculate_energy, load_workbook
+
+    workbook = fixture(directory, f"cycle_{rows}.xlsx", fixtures.write_drive_cycle, rows)
+    data, eff_table = load_workbook(workbook)
+
+    def run():
+        calculate_energy(data, eff_table, 36.078, 0.1727, -0.0028, 138, 75, 3965)
+
+    return run, rows, None
+
+
+def coastdown_smooth(directory, rows):
+    from coastdown import SmoothedForce, fit_span
+    from table_loader import load_columns
+
+    path = fixture(directory, f"coastdown_{rows}.csv", fixtures.write_coastdown_csv, rows)
+    speed_col, accel_col = 'Speed (km/h)', 'Longitudinal acceleration (g)'
+
+    def run():
+        df = load_columns(path, [speed_col, accel_col])
+        force = SmoothedForce(df[accel_col].values).force(5, fixtures.COASTDOWN_MASS)
+        # The first coastdown run of the trace, as a user would select it
+        fit_span(df[speed_col].values, force, 3000, 5000)
+
+    return run, rows, os.path.getsize(path)
+
+
+def coastdown_detect(directory, rows):
+    from coastdown import analyze_trace
+    from table_loader import load_columns
+
+    path = fixture(directory, f"coastdown_{rows}.csv", fixtures.write_coastdown_csv, rows)
+    df = load_columns(path, ['Speed (km/h)', 'Longitudinal acceleration (g)', 'Throttle (%)'], float32=False)
+
+    def run():
+        analyze_trace(df['Speed (km/h)'].values, df['Longitudinal acceleration (g)'].values,
+                      fixtures.COASTDOWN_MASS, throttle=df['Throttle (%)'].values)
+
+    return run, rows, None
+
+
+def surface_frames(directory, rows):
+    from surface_grid import SurfaceData
+    from table_loader import load_columns
+
+    path = fixture(directory, f"surface_{rows}.csv", fixtures.write_surface_csv, rows)
+    columns = ['Time', 'X', 'Y', 'Z']
+
+    def run():
+        df = load_columns(path, columns, precise=('Time',))
+        surface = SurfaceData(df, *columns)
+        step = (surface.max_time - surface.min_time - 1.0) / SURFACE_FRAMES
+        for frame in range(SURFACE_FRAMES):
+            surface.grid(surface.min_time + frame * step, 1.0)
+
+    return run, rows, os.path.getsize(path)
+
+
+BENCHMARKS = {
+    'mf4_convert': ('mf4_convert', mf4_convert),
+    'range_load': ('range', range_load),
+    'range_physics': ('range', range_physics),
+    'coastdown_smooth': ('coastdown', coastdown_smooth),
+    'coastdown_detect': ('coastdown', coastdown_detect),
+    'surface_frames': ('surface', surface_frames),
+}
+
+
+def measure(run, repeat):
+    """(best wall time in s, peak traced allocation in bytes) of run()."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    # Tracing slows allocations down, so the peak is taken in a separate, untimed run.
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=['small', 'medium'])
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run just these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (best is reported)")
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "bench_fixtures"),
+                        help="folder the generated fixtures are kept in")
+    parser.add_argument("--output", help="append the JSON lines to this file instead of printing them")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.fixtures, exist_ok=True)
+    context = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), **environment()}
+    output = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        for size in args.sizes:
+            for name in args.only or BENCHMARKS:
+                kind, setup = BENCHMARKS[name]
+                record = {'benchmark': name, 'size': size}
+                try:
+                    run, rows, input_bytes = setup(args.fixtures, SIZES[size][kind])
+                    seconds, peak = measure(run, args.repeat)
+                    record.update({'rows': rows, 'seconds': round(seconds, 6),
+                                   'rows_per_s': round(rows / seconds, 1), 'peak_mib': round(peak / 2 ** 20, 2)})
+                    if input_bytes:
+                        record['input_mib_per_s'] = round(input_bytes / 2 ** 20 / seconds, 2)
+                except Exception as e:
+                    record['error'] = f"{type(e).__name__}: {e}"
+                print(json.dumps({**record, **context}), file=output, flush=True)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compares the per-frame griddata call of "4D plot.py" with the SurfaceData methods.
+
+Plays a synthetic 100 Hz recording through SurfaceData one 10 s window per frame
+for three kinds of data:
+a motor map logged on a regular grid, scattered data that keeps revisiting the
+same operating points, and fully random points. Each method starts with empty
+caches, so the times include building them.
+
+    python benchmarks/bench_surface_grid.py [--frames 50] [--resolution 100]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from surface_grid import METHODS, SurfaceData  # noqa: E402
+
+
+def gridded(n_rows, rng):
+    """Speed/torque sweep: every row sits on a 40 x 25 grid node."""
+    speed, torque = np.meshgrid(np.linspace(0, 6000, 40), np.linspace(0, 250, 25))
+    node = np.arange(n_rows) % speed.size
+    return speed.ravel()[node], torque.ravel()[node]
+
+
+def operating_points(n_rows, rng):
+    """Scattered, but the same 1000 operating points are visited in every window."""
+    points = rng.uniform(0, 1, (1000, 2))
+    node = np.arange(n_rows) % len(points)
+    return points[node, 0], points[node, 1]
+
+
+def scattered(n_rows, rng):
+    """No structure at all: every window has new points."""
+    return rng.uniform(0, 1, n_rows), rng.uniform(0, 1, n_rows)
+
+
+def make_frame(layout, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    x, y = layout(n_rows, rng)
+    z = np.sin(x / x.max() * 3) * np.cos(y / y.max() * 2)
+    return pd.DataFrame({'Time': np.arange(n_rows) / 100.0, 'X': x, 'Y': y, 'Z': z})
+
+
+def play(df, method, frames, resolution):
+    surface = SurfaceData(df, 'Time', 'X', 'Y', 'Z', resolution=resolution, method=method)
+    start = time.perf_counter()
+    for frame in range(frames):
+        # 1000 samples per window, i.e. one full pass over the grid / operating points
+        surface.grid(frame * 10.0, 9.995)
+    return (time.perf_counter() - start) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=50, help="windows played per method")
+    parser.add_argument("--resolution", type=int, default=100, help="output grid size for scattered data")
+    args = parser.parse_args()
+
+    n_rows = (args.frames + 1) * 1000
+    print(f"{'data':>16} " + " ".join(f"{method + ' (ms)':>15}" for method in METHODS))
+    for layout in (gridded, operating_points, scattered):
+        df = make_frame(layout, n_rows)
+        times = [play(df, method, args.frames, args.resolution) for method in METHODS]
+        print(f"{layout.__name__:>16} " + " ".join(f"{t * 1000:>15.2f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Synthetic input files for the benchmark suite, generated locally at any size.
+
+* write_can_mf4 / write_dbc - CAN bus logging MF4 plus the DBC that decodes it,
+  the input of mf4_converter.process_mf4.
+* write_drive_cycle        - a range-calculator workbook (Sheet1 cycle, Sheet3
+  efficiency table).
+* write_coastdown_csv      - a coastdown trace with repeated throttle-off runs
+  following a known road load, for the coastdown app and coastdown.py.
+* write_surface_csv        - a Time/X/Y/Z recording for "4D plot.py".
+
+The CSV fixtures carry extra unused signals, like converted MF4 recordings do.
+"""
+import numpy as np
+import pandas as pd
+
+# Road load of the synthetic coastdown runs: A in N, C in N/(km/h)^2, mass in kg
+COASTDOWN_A, COASTDOWN_C, COASTDOWN_MASS = 30.0, 0.02, 170.0
+
+
+def write_dbc(path, n_messages=20, signals_per_message=4):
+    """DBC with n_messages 8-byte messages of 16-bit signals (with VAL_ tables for filter_dbc to drop)."""
+    lines = ['VERSION ""', '', 'NS_ :', '', 'BS_:', '', 'BU_: ECU', '']
+    for message in range(n_messages):
+        lines.append(f"BO_ {0x100 + message} Message_{message}: 8 ECU")
+        for signal in range(signals_per_message):
+            lines.append(f' SG_ Signal_{message}_{signal} : {16 * signal}|16@1+ (0.01,0) [0|655.35] "" Vector__XXX')
+        lines.append('')
+    for message in range(n_messages):
+        lines.append(f'VAL_ {0x100 + message} Signal_{message}_0 0 "Off" 1 "On" ;')
+    with open(path, 'w') as file:
+        file.write("\n".join(lines) + "\n")
+
+
+def can_frames(duration, n_messages=20, signals_per_message=4, rate=100.0, seed=0):
+    """(timestamps, ids, data bytes) of every message sent at rate Hz with jitter, in time order."""
+    rng = np.random.default_rng(seed)
+    per_message = int(duration * rate)
+    timestamps = (np.arange(per_message) / rate)[None, :] + rng.uniform(0, 1 / rate, (n_messages, per_message))
+    ids = np.repeat(0x100 + np.arange(n_messages), per_message)
+
+    phase = rng.uniform(0, 2 * np.pi, (n_messages, signals_per_message, 1))
+    raw = (30000 + 20000 * np.sin(timestamps[:, None, :] / 10 + phase)).astype('<u2')
+    data = np.zeros((n_messages, per_message, 8), dtype=np.uint8)
+    data[:, :, :2 * signals_per_message] = raw.transpose(0, 2, 1).copy().view(np.uint8)
+
+    order = np.argsort(timestamps.ravel(), kind='stable')
+    return timestamps.ravel()[order], ids[order], data.reshape(-1, 8)[order]
+
+
+def write_can_mf4(path, duration, n_messages=20, signals_per_message=4, rate=100.0, seed=0):
+    """MF4 with one CAN bus logging group (CAN_DataFrame) holding duration seconds of frames.
+
+    Returns the number of frames written.
+    """
+    from asammdf import MDF, Signal
+    from asammdf.blocks import v4_constants as v4c
+    from asammdf.blocks.source_utils import Source
+
+    timestamps, ids, data = can_frames(duration, n_messages, signals_per_message, rate, seed)
+    frames = np.zeros(len(timestamps), dtype=[
+        ('CAN_DataFrame.BusChannel', 'u1'), ('CAN_DataFrame.ID', '<u4'), ('CAN_DataFrame.IDE', 'u1'),
+        ('CAN_DataFrame.DLC', 'u1'), ('CAN_DataFrame.DataLength', 'u1'),
+        ('CAN_DataFrame.DataBytes', 'u1', (8,)), ('CAN_DataFrame.Dir', 'u1'),
+    ])
+    frames['CAN_DataFrame.BusChannel'] = 1
+    frames['CAN_DataFrame.ID'] = ids
+    frames['CAN_DataFrame.DLC'] = 8
+    frames['CAN_DataFrame.DataLength'] = 8
+    frames['CAN_DataFrame.DataBytes'] = data
+
+    source = Source("CAN1", "CAN1", "synthetic bus logging", Source.SOURCE_BUS, Source.BUS_TYPE_CAN)
+    mdf = MDF(version="4.10")
+    mdf.append([Signal(frames, timestamps, name="CAN_DataFrame", source=source)],
+               acq_name="CAN1", acq_source=source, common_timebase=True)
+    # Mark the group as bus logging, which is what extract_bus_logging looks for.
+    mdf.groups[-1].channel_group.flags |= v4c.FLAG_CG_BUS_EVENT
+    mdf.save(path, overwrite=True)
+    mdf.close()
+    return len(timestamps)
+
+
+def write_drive_cycle(path, n_rows, seed=0):
+    """Drive-cycle workbook with n_rows 1 Hz samples of a repeated urban/extra-urban speed profile."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_rows, dtype=float)
+    speed = np.clip(35 + 30 * np.sin(t / 90) + 15 * np.sin(t / 17) + rng.normal(0, 1, n_rows), 0, None)
+    speed[(t % 600) < 30] = 0  # stops
+
+    efficiency = pd.DataFrame({'Speed': ['km/h'] + list(range(0, 101, 10)),
+                               'Efficiency': ['-'] + list(np.linspace(0.6, 0.88, 11))})
+    with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+        pd.DataFrame({'timestamps': t, 'Speed_dyno': speed}).to_excel(writer, sheet_name='Sheet1', index=False)
+        pd.DataFrame().to_excel(writer, sheet_name='Sheet2', index=False)
+        efficiency.to_excel(writer, sheet_name='Sheet3', index=False)
+
+
+def coastdown_run(rate, v_start=80.0, v_end=15.0):
+    """Speed (km/h) of one throttle-off run from v_start to v_end under the synthetic road load.
+
+    F = A + C v^2 gives v(t) = sqrt(A/C) tan(atan(v0 sqrt(C/A)) - sqrt(AC) t / m) in SI units.
+    """
+    a, c = COASTDOWN_A, COASTDOWN_C * 3.6 ** 2
+    v0, v1 = v_start / 3.6, v_end / 3.6
+    k = np.sqrt(c / a)
+    duration = (np.arctan(v0 * k) - np.arctan(v1 * k)) * COASTDOWN_MASS / np.sqrt(a * c)
+    t = np.arange(0, duration, 1 / rate)
+    return np.tan(np.arctan(v0 * k) - np.sqrt(a * c) * t / COASTDOWN_MASS) / k * 3.6
+
+
+def write_coastdown_csv(path, n_rows, rate=100.0, extra_columns=40, seed=0):
+    """Coastdown trace: runs of acceleration to 80 km/h followed by a coastdown to 15 km/h, repeated."""
+    rng = np.random.default_rng(seed)
+    coast = coastdown_run(rate)
+    accelerate = np.arange(coast[-1], coast[0], 1.5 * 3.6 / rate)
+    cycle_speed = np.concatenate([accelerate, coast])
+    cycle_throttle = np.concatenate([np.full(len(accelerate), 50.0), np.zeros(len(coast))])
+
+    repeats = n_rows // len(cycle_speed) + 1
+    speed = np.tile(cycle_speed, repeats)[:n_rows]
+    throttle = np.tile(cycle_throttle, repeats)[:n_rows]
+    accel_g = np.gradient(speed / 3.6) * rate / 9.81
+
+    columns = {
+        'Time (s)': np.arange(n_rows) / rate,
+        'Speed (km/h)': speed + rng.normal(0, 0.05, n_rows),
+        'Longitudinal acceleration (g)': accel_g + rng.normal(0, 0.005, n_rows),
+        'Throttle (%)': throttle,
+    }
+    columns.update({f'Signal_{i}': rng.normal(size=n_rows) for i in range(extra_columns)})
+    pd.DataFrame(columns).to_csv(path, index=False)
+
+
+def write_surface_csv(path, n_rows, rate=100.0, extra_columns=40, seed=0):
+    """Time/X/Y/Z recording whose X/Y operating points are revisited, like a motor map sweep."""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 1, (1000, 2))
+    node = np.arange(n_rows) % len(points)
+    x, y = points[node, 0] * 6000, points[node, 1] * 250
+    columns = {'Time': np.arange(n_rows) / rate, 'X': x, 'Y': y,
+               'Z': np.sin(x / 6000 * 3) * np.cos(y / 250 * 2) + rng.normal(0, 0.01, n_rows)}
+    columns.update({f'Signal_{i}': rng.normal(size=n_rows) for i in range(extra_columns)})
+    pd.DataFrame(columns).to_csv(path, index=False)
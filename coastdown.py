@@ -0,0 +1,359 @@
+"""Coastdown segment detection and road-load fitting behind "Coastdown data analysis app.py".
+
+Instead of fitting one hand-picked span, detect_segments finds every coastdown
+run in a trace: stretches where the smoothed speed keeps falling, the vehicle
+decelerates and (if a throttle channel is logged) the throttle is closed.
+fit_segments then fits F = A + C * v^2 to all of them in one vectorized
+least-squares solve, from per-segment sums, and pair_segments averages runs
+driven in opposite directions to cancel wind and slope.
+
+Folders of recordings are processed in worker processes and the results are
+collected into one table, like range_energy does for drive cycles:
+
+    python coastdown.py runs/ --vehicle-wt 100 --rider-wt 70 --throttle-col "Throttle (%)" \
+        --output segments.csv --pairs pairs.csv
+"""
+import argparse
+import difflib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from scipy.signal import savgol_filter
+
+from batch import errors_last, expand_paths, report_errors
+from table_loader import load_columns, read_header
+
+G = 9.81
+SPEED_COLUMN = "Speed (km/h)"
+ACCEL_COLUMN = "Longitudinal acceleration (g)"
+FILTERS = ("moving average", "savitzky-golay")
+
+
+def find_column(target, columns, cutoff=0.6):
+    """The column of columns closest to target (case-insensitive, surrounding spaces ignored), or None."""
+    stripped = {col.strip().lower(): col for col in columns}
+    match = difflib.get_close_matches(target.strip().lower(), list(stripped), n=1, cutoff=cutoff)
+    return stripped[match[0]] if match else None
+
+
+def moving_average(values, window):
+    """Centered moving average from a cumulative sum.
+
+    Matches Series.rolling(window, min_periods=1, center=True).mean(): NaNs are
+    skipped and windows are truncated at both ends of the trace.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    index = np.arange(len(values))
+    lo = np.clip(index - window // 2, 0, len(values))
+    hi = np.clip(index + (window - 1) // 2 + 1, 0, len(values))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums[hi] - sums[lo]) / (counts[hi] - counts[lo])
+
+
+def smooth(values, window, method="moving average", polyorder=2):
+    """Smooths values with one of FILTERS over window samples.
+
+    "savitzky-golay" fits a polyorder polynomial in every window, which keeps the
+    shape of short deceleration peaks better than a plain average. Its window is
+    rounded up to the next odd length above polyorder, and NaNs are filled by
+    linear interpolation first since the filter cannot skip them.
+    """
+    if method == "moving average":
+        return moving_average(values, window)
+    if method != "savitzky-golay":
+        raise ValueError(f"Unknown filter {method!r}; expected one of {FILTERS}")
+    values = np.asarray(values, dtype=float)
+    window = max(window, polyorder + 1) | 1
+    if window > len(values):
+        window = len(values) - (1 - len(values) % 2)
+    if window <= polyorder:
+        return values.copy()
+    missing = np.isnan(values)
+    if missing.any() and not missing.all():
+        index = np.arange(len(values))
+        values = np.where(missing, np.interp(index, index[~missing], values[~missing]), values)
+    return savgol_filter(values, window, polyorder, mode='interp')
+
+
+class SmoothedForce:
+    """Smoothed acceleration and force of one trace, recomputed only as far as a change requires.
+
+    Smoothed curves are kept per (filter, window), so going back to a window tried
+    before is free, and a new vehicle or rider weight only rescales the cached
+    curve instead of filtering the whole trace again.
+    """
+
+    def __init__(self, accel_g, cache_size=8):
+        self.accel = np.asarray(accel_g, dtype=float)
+        self.cache_size = cache_size
+        self._smoothed = OrderedDict()
+
+    def smoothed(self, window, method="moving average"):
+        key = (method, window)
+        if key in self._smoothed:
+            self._smoothed.move_to_end(key)
+            return self._smoothed[key]
+        curve = smooth(self.accel, window, method)
+        self._smoothed[key] = curve
+        if len(self._smoothed) > self.cache_size:
+            self._smoothed.popitem(last=False)
+        return curve
+
+    def force(self, window, total_mass, method="moving average"):
+        """total_mass * 9.81 * the smoothed acceleration (g), in N."""
+        return total_mass * G * self.smoothed(window, method)
+
+
+def true_runs(mask, max_gap=0):
+    """(starts, stops) of the runs of True in mask, stops exclusive.
+
+    Runs separated by at most max_gap False samples are joined into one.
+    """
+    edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    if max_gap and len(starts) > 1:
+        separate = starts[1:] - stops[:-1] > max_gap
+        starts = starts[np.concatenate(([True], separate))]
+        stops = stops[np.concatenate((separate, [True]))]
+    return starts, stops
+
+
+def detect_segments(speed, accel, throttle=None, window=25, min_speed=5.0, min_drop=10.0,
+                    min_samples=50, max_gap=10, throttle_off=1.0):
+    """Finds the coastdown runs of a trace.
+
+    A sample belongs to a run when the speed, smoothed over window samples, is
+    not rising, the smoothed acceleration is negative, the speed is at least
+    min_speed and the throttle (if given) is at most throttle_off. Runs
+    interrupted for up to max_gap samples are joined; runs shorter than
+    min_samples or losing less than min_drop km/h are discarded.
+    Returns (starts, stops) index arrays, stops exclusive.
+    """
+    speed = np.asarray(speed, dtype=float)
+    smoothed = moving_average(speed, window)
+    coasting = ((np.gradient(smoothed) <= 0) & (moving_average(accel, window) < 0)
+                & (speed >= min_speed))
+    if throttle is not None:
+        coasting &= np.asarray(throttle, dtype=float) <= throttle_off
+
+    starts, stops = true_runs(coasting, max_gap)
+    keep = ((stops - starts >= min_samples)
+            & (smoothed[starts] - smoothed[np.maximum(stops - 1, 0)] >= min_drop))
+    return starts[keep], stops[keep]
+
+
+def fit_segments(speed, force, starts, stops):
+    """Least-squares F = A + C * v^2 for every segment at once.
+
+    All segments are gathered into one index array and their sums are taken
+    with np.add.reduceat, so the fits cost a few array passes however many
+    segments there are. NaN samples are ignored. Returns a dict of A, C and r2
+    arrays, one value per segment (NaN where a segment cannot be fitted).
+    """
+    lengths = stops - starts
+    if not len(lengths):
+        return {'A': np.array([]), 'C': np.array([]), 'r2': np.array([])}
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    index = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+    x = np.asarray(speed, dtype=float)[index] ** 2
+    y = np.asarray(force, dtype=float)[index]
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+
+    sums = [np.add.reduceat(values, offsets) for values in (valid.astype(float), x, y, x * x, x * y, y * y)]
+    A, C, r2 = least_squares(*sums)
+    return {'A': A, 'C': C, 'r2': r2}
+
+
+def least_squares(n, sx, sy, sxx, sxy, syy):
+    """(A, C, r2) of the straight line y = A + C * x through points with the given sums."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        C = (n * sxy - sx * sy) / (n * sxx - sx ** 2)
+        A = (sy - C * sx) / n
+        r2 = 1 - (syy - A * sy - C * sxy) / (syy - sy ** 2 / n)
+    return A, C, r2
+
+
+def fit_span(speed, force, first, last):
+    """(A, C) of F = A + C * v^2 over samples first..last (both included), by np.polyfit."""
+    coeffs = np.polyfit(np.asarray(speed[first:last + 1], dtype=float) ** 2, force[first:last + 1], 1)
+    return coeffs[1], coeffs[0]
+
+
+class SpanFit:
+    """F = A + C * v^2 fits of arbitrary sample spans of one trace in constant time.
+
+    Prefix sums of the regression terms are built once, so fitting a span is a
+    handful of subtractions - cheap enough to refit on every mouse move while
+    span markers are dragged.
+    """
+
+    def __init__(self, speed, force):
+        x = np.asarray(speed, dtype=float) ** 2
+        y = np.asarray(force, dtype=float)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+        self.prefix = [np.concatenate(([0.0], np.cumsum(values)))
+                       for values in (valid.astype(float), x, y, x * x, x * y, y * y)]
+
+    def fit(self, first, last):
+        """(A, C, r2) over samples first..last, both included."""
+        return least_squares(*(prefix[last + 1] - prefix[first] for prefix in self.prefix))
+
+
+def envelope(values, lo, hi, bins):
+    """Min/max envelope of values[lo:hi] in bins equal slices, for drawing long traces.
+
+    Returns (index, values) with the minimum and maximum of every slice placed at
+    the slice's first sample - what a full-resolution line looks like when each
+    slice covers about one pixel. Short ranges are returned as they are.
+    """
+    lo, hi = max(0, int(lo)), min(len(values), int(hi))
+    if hi - lo <= 2 * bins:
+        return np.arange(lo, hi), values[lo:hi]
+    starts = np.unique(np.linspace(lo, hi, bins + 1).astype(np.int64)[:-1])
+    chunk = values[lo:hi]
+    low = np.fmin.reduceat(chunk, starts - lo)
+    high = np.fmax.reduceat(chunk, starts - lo)
+    return np.repeat(starts, 2), np.column_stack([low, high]).ravel()
+
+
+def segment_headings(heading, starts, stops):
+    """Circular mean heading (degrees) of every segment."""
+    radians = np.deg2rad(np.asarray(heading, dtype=float))
+    offsets = np.concatenate(([0], np.cumsum(stops - starts)[:-1]))
+    index = np.repeat(starts - offsets, stops - starts) + np.arange((stops - starts).sum())
+    sin = np.add.reduceat(np.sin(radians[index]), offsets)
+    cos = np.add.reduceat(np.cos(radians[index]), offsets)
+    return np.rad2deg(np.arctan2(sin, cos)) % 360
+
+
+def pair_segments(headings=None, n_segments=None):
+    """Pair number of every segment: each run is paired with the next unpaired run driven the other way.
+
+    Without headings consecutive runs are assumed to alternate in direction and are
+    paired in order. Runs left without a partner get pair -1.
+    """
+    n_segments = len(headings) if headings is not None else n_segments
+    pairs = np.full(n_segments, -1)
+    pair = 0
+    for i in range(n_segments):
+        if pairs[i] >= 0:
+            continue
+        for j in range(i + 1, n_segments):
+            if pairs[j] >= 0:
+                continue
+            if headings is None or abs((headings[j] - headings[i] + 180) % 360 - 180) > 90:
+                pairs[i] = pairs[j] = pair
+                pair += 1
+                break
+    return pairs
+
+
+def analyze_trace(speed, accel_g, total_mass, throttle=None, heading=None, smoothing=5, **detect):
+    """Detects and fits every coastdown run of one trace.
+
+    The force is total_mass * 9.81 * accel smoothed over smoothing samples, as in
+    the app's Smooth & Calculate. Returns one row per segment with its sample
+    range, start/end speed, A, C, r2, heading (if given) and pair number.
+    """
+    speed = np.asarray(speed, dtype=float)
+    force = total_mass * G * moving_average(accel_g, smoothing)
+    starts, stops = detect_segments(speed, accel_g, throttle, **detect)
+    fits = fit_segments(speed, force, starts, stops)
+
+    segments = pd.DataFrame({'start': starts, 'stop': stops, 'v_start': speed[starts],
+                             'v_end': speed[np.maximum(stops - 1, 0)], **fits})
+    headings = None
+    if heading is not None and len(starts):
+        headings = segment_headings(heading, starts, stops)
+        segments['heading'] = headings
+    segments['pair'] = pair_segments(headings, len(starts))
+    return segments
+
+
+def pair_summary(segments):
+    """Averages A and C over the two runs of every pair (per file when there is a file column)."""
+    keys = [col for col in ('file',) if col in segments.columns] + ['pair']
+    paired = segments[segments['pair'] >= 0]
+    return paired.groupby(keys, as_index=False).agg(A=('A', 'mean'), C=('C', 'mean'), runs=('A', 'size'))
+
+
+def analyze_file(file_path, total_mass, throttle_col=None, heading_col=None, **options):
+    """Loads the speed/acceleration (and optional throttle/heading) columns of a file and analyzes it.
+
+    Speed and acceleration are matched to the file's header like the app does;
+    throttle_col and heading_col are matched the same way. If the file cannot be
+    processed a single row carrying the error message is returned instead.
+    """
+    try:
+        header = read_header(file_path)
+        names = {'speed': find_column(SPEED_COLUMN, header), 'accel': find_column(ACCEL_COLUMN, header)}
+        if names['speed'] is None or names['accel'] is None:
+            raise ValueError(f"Required columns not found. Available: {header}")
+        for key, target in (('throttle', throttle_col), ('heading', heading_col)):
+            if target:
+                names[key] = find_column(target, header)
+                if names[key] is None:
+                    raise ValueError(f"No column matching {target!r}")
+
+        frame = load_columns(file_path, list(names.values()), float32=False)
+        columns = {key: frame[name].to_numpy() for key, name in names.items()}
+        segments = analyze_trace(columns.pop('speed'), columns.pop('accel'), total_mass, **columns, **options)
+        segments.insert(0, 'file', file_path)
+        segments.insert(1, 'segment', np.arange(len(segments)))
+        return segments
+    except Exception as e:
+        return pd.DataFrame([{'file': file_path, 'error': str(e)}])
+
+
+def batch_analyze(files, total_mass, workers=None, **options):
+    """Analyzes every file across a process pool and returns the consolidated segment table."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tables = list(pool.map(partial(analyze_file, total_mass=total_mass, **options), files))
+    return errors_last(pd.concat(tables, ignore_index=True) if tables else pd.DataFrame())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect and fit coastdown runs in recorded traces.")
+    parser.add_argument('files', nargs='+', help="CSV/Parquet/Feather traces or folders of CSVs")
+    parser.add_argument('--vehicle-wt', type=float, default=100.0, help="vehicle weight (kg)")
+    parser.add_argument('--rider-wt', type=float, default=70.0, help="rider weight (kg)")
+    parser.add_argument('--smoothing', type=int, default=5, help="acceleration moving-average window (samples)")
+    parser.add_argument('--throttle-col', help="throttle column; runs require it to be at most --throttle-off")
+    parser.add_argument('--throttle-off', type=float, default=1.0, help="largest throttle value counted as closed")
+    parser.add_argument('--heading-col', help="heading column (degrees) used to pair opposite-direction runs")
+    parser.add_argument('--min-drop', type=float, default=10.0, help="smallest speed loss of a run (km/h)")
+    parser.add_argument('--min-samples', type=int, default=50, help="shortest run (samples)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument('--output', default='coastdown_segments.csv', help="segment table")
+    parser.add_argument('--pairs', default='coastdown_pairs.csv', help="averaged opposite-direction pairs")
+    args = parser.parse_args(argv)
+
+    files = expand_paths(args.files, '*.csv')
+    segments = batch_analyze(files, args.vehicle_wt + args.rider_wt, args.workers,
+                             throttle_col=args.throttle_col, heading_col=args.heading_col,
+                             smoothing=args.smoothing, throttle_off=args.throttle_off,
+                             min_drop=args.min_drop, min_samples=args.min_samples)
+    segments.to_csv(args.output, index=False)
+    fitted = segments.dropna(subset=['A']) if 'A' in segments.columns else segments.iloc[:0]
+    # Error rows carry no pair, which made the column float; without them it is an integer again.
+    fitted = fitted.astype({'pair': int}) if len(fitted) else fitted
+    pairs = pair_summary(fitted) if len(fitted) else pd.DataFrame(columns=['file', 'pair', 'A', 'C', 'runs'])
+    pairs.to_csv(args.pairs, index=False)
+    print(f"{len(fitted)} runs and {len(pairs)} pairs from {len(files)} files written to "
+          f"{args.output} and {args.pairs}")
+
+    return 1 if report_errors(segments, 'file') else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+"""Virtualized table widget for browsing large DataFrames in the GUIs.
+
+A ttk.Treeview slows down with every item it holds, so DataTable never gives it
+more items than fit on screen. It keeps one row item per visible line and, on
+scrolling, rewrites their values from the column arrays of the frame; the
+vertical scrollbar is driven from the row position instead of from the
+Treeview. Showing a new frame updates the headings in place, so the cost of
+browsing a file is the same whether it has a hundred rows or ten million.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+# Used when the ttk theme does not define a Treeview row height
+DEFAULT_ROW_HEIGHT = 20
+
+
+class DataTable(tk.Frame):
+    def __init__(self, master, column_width=100, rows=10, **kwargs):
+        """rows is the number of lines the table asks for initially; on_resize follows the actual size."""
+        super().__init__(master, **kwargs)
+        self.column_width = column_width
+        self.columns = []
+        self.arrays = []
+        self.n_rows = 0
+        self.first = 0
+        self.page_rows = 0
+
+        self.tree = ttk.Treeview(self, show="headings", selectmode="none", height=rows)
+        self.vbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scroll)
+        xbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=xbar.set)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.vbar.grid(row=0, column=1, sticky="ns")
+        xbar.grid(row=1, column=0, sticky="ew")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(1, "units"))
+        self.tree.bind("<Prior>", lambda e: self.scroll_rows(-1, "pages"))
+        self.tree.bind("<Next>", lambda e: self.scroll_rows(1, "pages"))
+
+    def show(self, df):
+        """Displays df, keeping the scroll position if the frame still has that many rows."""
+        columns = [str(col) for col in df.columns]
+        if columns != self.columns:
+            self.tree["columns"] = columns
+            for col in columns:
+                self.tree.heading(col, text=col)
+                self.tree.column(col, width=self.column_width, stretch=False)
+            self.columns = columns
+        # Numeric columns come back without a copy; only the visible slice is ever formatted.
+        self.arrays = [df[col].to_numpy() for col in df.columns]
+        self.n_rows = len(df)
+        self.render()
+
+    def render(self):
+        """Writes the rows first .. first + page_rows into the row items and updates the scrollbar."""
+        self.first = max(0, min(self.first, self.n_rows - self.page_rows))
+        items = self.tree.get_children()
+        shown = min(self.page_rows, self.n_rows - self.first)
+        if len(items) > shown:
+            self.tree.delete(*items[shown:])
+            items = items[:shown]
+        for _ in range(shown - len(items)):
+            self.tree.insert("", "end")
+        items = self.tree.get_children()
+
+        page = [array[self.first:self.first + shown] for array in self.arrays]
+        for i, item in enumerate(items):
+            self.tree.item(item, values=[str(values[i]) for values in page])
+
+        if self.n_rows:
+            self.vbar.set(self.first / self.n_rows, (self.first + shown) / self.n_rows)
+        else:
+            self.vbar.set(0, 1)
+
+    def on_resize(self, event):
+        style = ttk.Style(self)
+        row_height = int(style.lookup("Treeview", "rowheight") or DEFAULT_ROW_HEIGHT)
+        # One line goes to the headings (and a little to the borders).
+        page_rows = max(1, event.height // row_height - 1)
+        if page_rows != self.page_rows:
+            self.page_rows = page_rows
+            self.render()
+
+    def on_scroll(self, action, amount, unit=None):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units" | "pages")."""
+        if action == "moveto":
+            self.first = int(float(amount) * self.n_rows)
+            self.render()
+        else:
+            self.scroll_rows(int(amount), unit)
+
+    def scroll_rows(self, n, unit):
+        self.first += n * (max(1, self.page_rows - 1) if unit == "pages" else 3)
+        self.render()
+        return "break"
@@ -0,0 +1,714 @@
+"""MF4 decode/resample/export routines used by "MF4 to CSV Bulk Conversion.ipynb".
+
+These live in a plain module rather than in the notebook so that they can be
+pickled into worker processes (Windows and macOS spawn fresh interpreters that
+cannot see functions defined inside a notebook kernel). The same conversion
+also runs without the notebook or a display:
+
+    python mf4_converter.py logs/ --dbc vehicle.dbc --output csv/ --raster 0.1 \
+        --format parquet --channels "Speed*" "*Current*"
+"""
+import argparse
+import copy
+import cProfile
+import fnmatch
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing, contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from asammdf import MDF
+from asammdf.blocks.utils import load_can_database
+import numpy as np
+import pandas as pd
+
+import trace_store
+
+
+# Parsed, VAL_-filtered DBCs keyed on a hash of the file contents, plus an index of
+# (path, mtime, size) -> hash so an unchanged DBC is not even re-read. Worker processes
+# are seeded with the parent's parsed database (see convert_files).
+_dbc_cache = {}
+_dbc_index = {}
+# (DBC hash, channel patterns) -> database pruned to the matching signals
+_selected_dbc_cache = {}
+
+
+def filter_dbc(dbc_contents):
+    """Filters out lines starting with VAL_ from the raw DBC contents."""
+    lines = dbc_contents.splitlines(keepends=True)
+    return b"".join(line for line in lines if not line.strip().startswith(b"VAL_"))
+
+
+def _dbc_key(dbc_file):
+    stat = os.stat(dbc_file)
+    return os.path.abspath(dbc_file), stat.st_mtime_ns, stat.st_size
+
+
+def _load_dbc_entry(dbc_file):
+    key = _dbc_key(dbc_file)
+    digest = _dbc_index.get(key)
+    if digest is None:
+        with open(dbc_file, 'rb') as file:
+            contents = file.read()
+        digest = hashlib.sha256(contents).hexdigest()
+        if digest not in _dbc_cache:
+            database = load_can_database(dbc_file, contents=filter_dbc(contents))
+            if database is None:
+                raise ValueError(f"Could not load CAN database from {dbc_file}")
+            _dbc_cache[digest] = database
+        _dbc_index[key] = digest
+    return key, digest, _dbc_cache[digest]
+
+
+def _seed_dbc_cache(key, digest, database):
+    _dbc_index[key] = digest
+    _dbc_cache[digest] = database
+
+
+def read_channel_list(list_file):
+    """Reads a saved channel list: one name or glob pattern per line, # starts a comment."""
+    with open(list_file, 'r') as file:
+        lines = [line.split('#', 1)[0].strip() for line in file]
+    return [line for line in lines if line]
+
+
+def channel_matches(name, channels):
+    """True if name matches any of the (case-insensitive, glob-style) channel patterns."""
+    return any(fnmatch.fnmatch(name.lower(), pattern.lower()) for pattern in channels)
+
+
+def select_dbc_signals(database, channels):
+    """Returns a copy of database holding only the signals matching channels.
+
+    Messages left without signals are dropped entirely. Multiplexor signals are kept
+    for any message that still has signals, since they are needed for decoding.
+    """
+    database = copy.deepcopy(database)
+    for frame in list(database.frames):
+        if any(channel_matches(signal.name, channels) for signal in frame.signals):
+            frame.signals = [signal for signal in frame.signals
+                             if signal.is_multiplexer or channel_matches(signal.name, channels)]
+        else:
+            database.del_frame(frame)
+    if not database.frames:
+        raise ValueError(f"No DBC signals match the channel list {channels}")
+    return database
+
+
+def load_dbc(dbc_file, channels=None):
+    """Returns the parsed CAN database for dbc_file without its VAL_ lines, parsing each DBC once.
+
+    With channels (a list of names or glob patterns) only the matching signals are
+    kept, so extract_bus_logging never decodes the rest.
+    """
+    _, digest, database = _load_dbc_entry(dbc_file)
+    if not channels:
+        return database
+
+    key = (digest, tuple(channels))
+    if key not in _selected_dbc_cache:
+        _selected_dbc_cache[key] = select_dbc_signals(database, channels)
+    return _selected_dbc_cache[key]
+
+
+def decode_mf4(mf4_file, dbc_file, channels=None):
+    """Decodes the CAN bus logging in mf4_file with dbc_file and returns the decoded MDF in memory."""
+    with MDF(mf4_file) as mdf:
+        database_files = {"CAN": [(load_dbc(dbc_file, channels), 0)], "LIN": []}
+        return mdf.extract_bus_logging(database_files=database_files)
+
+
+def signals_to_frame(signals):
+    """Builds one Timestamp-keyed DataFrame from signals in a single columnar pass.
+
+    After mdf.resample every signal shares the same time base, so the sample arrays
+    are simply laid side by side. If some signal does not match, all columns are
+    aligned on the union of timestamps, which is what an outer merge would give.
+    Repeated signal names get a "_dup" suffix.
+    """
+    signals = list(signals)
+    if not signals:
+        return pd.DataFrame()
+
+    timestamps = signals[0].timestamps
+    aligned = all(np.array_equal(signal.timestamps, timestamps) for signal in signals[1:])
+    if not aligned:
+        timestamps = np.unique(np.concatenate([signal.timestamps for signal in signals]))
+
+    columns = {'Timestamp': timestamps}
+    for signal in signals:
+        samples = signal.samples
+        if not aligned:
+            samples = pd.Series(samples, index=signal.timestamps)
+            samples = samples.groupby(level=0).last().reindex(timestamps).values
+        signal_name = signal.name
+        while signal_name in columns:
+            signal_name = f"{signal_name}_dup"
+        columns[signal_name] = samples
+
+    return pd.DataFrame(columns)
+
+
+def iter_signal_frames(mdf, chunk_rows):
+    """Yields the signals_to_frame table of mdf in consecutive time chunks of about chunk_rows rows.
+
+    Only one chunk of samples is held in memory at a time. The chunk boundaries come
+    from the first channel group's time base and every group is cut on the same
+    boundaries, so each row ends up in exactly one chunk.
+    """
+    bounds = None
+    groups = []
+    for index, group in enumerate(mdf.groups):
+        master_index = mdf.masters_db.get(index)
+        channels = [(None, index, ch_index) for ch_index in range(len(group.channels)) if ch_index != master_index]
+        if not channels:
+            continue
+        master = mdf.get_master(index)
+        if bounds is None:
+            bounds = np.concatenate([[-np.inf], master[chunk_rows::chunk_rows], [np.inf]])
+        groups.append((channels, np.searchsorted(master, bounds)))
+
+    if not groups:
+        yield pd.DataFrame()
+        return
+
+    for chunk in range(len(bounds) - 1):
+        signals = []
+        for channels, offsets in groups:
+            offset, stop = int(offsets[chunk]), int(offsets[chunk + 1])
+            signals.extend(mdf.select(channels, record_offset=offset, record_count=stop - offset))
+        yield signals_to_frame(signals)
+
+
+def write_frames(frames, output_file, output_format="csv"):
+    """Writes an iterable of DataFrames with the same columns to one CSV or Parquet file, chunk by chunk."""
+    if output_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for frame in frames:
+                schema = writer.schema if writer is not None else None
+                table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_file, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    elif output_format == "csv":
+        header = True
+        for frame in frames:
+            frame.to_csv(output_file, index=False, mode='w' if header else 'a', header=header)
+            header = False
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+
+MANIFEST_NAME = "conversion_manifest.sqlite"
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def open_manifest(output_folder):
+    """Opens (creating it if needed) the conversion manifest database kept in output_folder.
+
+    SQLite is used so that several worker processes can update it concurrently.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    manifest = sqlite3.connect(os.path.join(output_folder, MANIFEST_NAME), timeout=60)
+    with manifest:
+        manifest.execute(
+            "CREATE TABLE IF NOT EXISTS conversions ("
+            " output_file TEXT PRIMARY KEY, source_file TEXT, source_size INTEGER, source_mtime_ns INTEGER,"
+            " source_sha256 TEXT, dbc_sha256 TEXT, settings TEXT, output_size INTEGER, output_sha256 TEXT)"
+        )
+    return manifest
+
+
+def is_up_to_date(manifest, output_folder, mf4_file, output_file, dbc_digest, settings):
+    """True if output_file was produced from the current mf4_file, DBC and settings and is still complete."""
+    key = os.path.relpath(output_file, output_folder)
+    row = manifest.execute(
+        "SELECT source_size, source_mtime_ns, source_sha256, dbc_sha256, settings, output_size"
+        " FROM conversions WHERE output_file = ?", (key,)
+    ).fetchone()
+    if row is None or not os.path.exists(output_file):
+        return False
+
+    source_size, source_mtime_ns, source_sha256, dbc_sha256, old_settings, output_size = row
+    stat = os.stat(mf4_file)
+    if (dbc_sha256, old_settings, source_size, output_size) != (dbc_digest, settings, stat.st_size,
+                                                               os.path.getsize(output_file)):
+        return False
+
+    if stat.st_mtime_ns != source_mtime_ns:
+        # Touched but maybe not modified (e.g. copied to a new archive): compare contents instead.
+        if file_sha256(mf4_file) != source_sha256:
+            return False
+        with manifest:
+            manifest.execute("UPDATE conversions SET source_mtime_ns = ? WHERE output_file = ?",
+                             (stat.st_mtime_ns, key))
+    return True
+
+
+def record_conversion(manifest, output_folder, output_file, mf4_file, source_stat, source_sha256,
+                      dbc_digest, settings, output_sha256):
+    key = os.path.relpath(output_file, output_folder)
+    with manifest:
+        manifest.execute(
+            "INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, os.path.abspath(mf4_file), source_stat.st_size, source_stat.st_mtime_ns, source_sha256,
+             dbc_digest, settings, os.path.getsize(output_file), output_sha256)
+        )
+
+
+class StageTimer:
+    """Wall time per named stage. Time spent in a nested stage is counted only for that stage."""
+
+    def __init__(self):
+        self.seconds = {}
+        self._nested = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed - self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def iterate(self, name, iterable):
+        """Yields the items of iterable, counting the time spent producing them as stage name."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+
+def current_rss_mib():
+    """Resident memory of this process right now in MiB, or None where it cannot be read.
+
+    Uses psutil when it is installed, otherwise /proc (Linux).
+    """
+    try:
+        import psutil
+    except ImportError:
+        pass
+    else:
+        return psutil.Process().memory_info().rss / 2 ** 20
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RssSampler:
+    """Highest resident memory between start() and stop(), sampled by a background thread.
+
+    ru_maxrss would be the peak over the whole life of a reused pool worker, so a
+    small file converted after a large one would report the large file's peak.
+    Sampling attributes the peak to the conversion that is running. peak_mib stays
+    None where the resident memory cannot be read.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mib = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = current_rss_mib()
+        if rss is not None and (self.peak_mib is None or rss > self.peak_mib):
+            self.peak_mib = rss
+        return rss is not None
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        if self.sample():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.sample()
+
+
+def process_mf4(mf4_file, dbc_file, output_folder, raster, input_root, save_decoded=False,
+                output_format="csv", chunk_rows=None, channels=None, store_folder=None, log=print, stats=None):
+    """Converts one MF4 file and returns "converted", "skipped" or "failed".
+
+    The decoded MDF is resampled and exported straight from memory; with save_decoded
+    it is also written next to the output as a decoded MF4. output_format is "csv" or
+    "parquet". With chunk_rows the export is streamed chunk_rows rows at a time, so
+    peak memory no longer grows with the recording length. channels restricts the
+    decode and export to the signals matching those names or glob patterns. With
+    store_folder the recording is also written to that trace store (see trace_store)
+    as the export is written.
+
+    A file is skipped only if the manifest in output_folder shows its output was made
+    from the same source contents, DBC and settings. The output is written under a
+    temporary name and renamed into place once complete. The store is not part of the
+    settings: if only the store file of an up-to-date export is missing, the recording
+    is decoded again for the store alone and the export is left as it is.
+
+    If a stats dict is given, the wall time of every stage is stored in it as
+    "<stage>_s" (dbc, manifest, hash, decode, save_decoded, resample, build, write, store),
+    together with bytes_read, bytes_written, rows and peak_rss_mib (the highest resident
+    memory sampled while this file was converted).
+    """
+    timer = StageTimer()
+    if stats is None:
+        stats = {}
+    file_name = os.path.basename(mf4_file)
+
+    if not os.path.exists(mf4_file):
+        log(f"Error: {mf4_file} does not exist.")
+        return "failed"
+
+    # Determine the relative path for the output file within the folder structure
+    relative_path = os.path.relpath(mf4_file, start=input_root)
+    output_file_dir = os.path.join(output_folder, os.path.dirname(relative_path))
+
+    os.makedirs(output_file_dir, exist_ok=True)
+
+    output_file = os.path.join(output_file_dir, f"{file_name.replace('.mf4', '.' + output_format)}")
+
+    settings = {"raster": raster, "output_format": output_format, "channels": channels or None}
+    store_file = None
+    if store_folder:
+        store_file = trace_store.store_path(store_folder, os.path.relpath(output_file, output_folder))
+    settings = json.dumps(settings, sort_keys=True)
+
+    rss = RssSampler()
+    rss.start()
+    try:
+        with timer.stage("dbc"):
+            dbc_digest = _load_dbc_entry(dbc_file)[1]
+            load_dbc(dbc_file, channels)
+        with timer.stage("manifest"), closing(open_manifest(output_folder)) as manifest:
+            export_current = is_up_to_date(manifest, output_folder, mf4_file, output_file, dbc_digest, settings)
+        if export_current and (store_file is None or os.path.exists(store_file)):
+            log(f"Up to date, skipping: {output_file}")
+            return "skipped"
+
+        source_stat = os.stat(mf4_file)
+        stats['bytes_read'] = source_stat.st_size
+        if not export_current:
+            with timer.stage("hash"):
+                source_sha256 = file_sha256(mf4_file)
+
+        with timer.stage("decode"):
+            decoded_mdf = decode_mf4(mf4_file, dbc_file, channels)
+        if save_decoded:
+            with timer.stage("save_decoded"):
+                decoded_mf4_file = os.path.join(output_file_dir, file_name)
+                decoded_mdf.save(decoded_mf4_file)
+            log(f"Decoded MF4 file saved as: {decoded_mf4_file}")
+
+        with timer.stage("resample"):
+            resampled_mdf = decoded_mdf.resample(raster=raster)
+
+        if chunk_rows:
+            frames = iter_signal_frames(resampled_mdf, chunk_rows)
+        else:
+            frames = map(signals_to_frame, [resampled_mdf])
+        # Frames are built lazily inside the write loop; that time is counted as "build", not "write".
+        frames = timer.iterate("build", frames)
+        store = None
+        if store_folder:
+            units = {channel.name: getattr(channel, 'unit', '') or ''
+                     for group in resampled_mdf.groups for channel in group.channels}
+            store = trace_store.StoreWriter(store_folder, os.path.relpath(output_file, output_folder), mf4_file,
+                                            units)
+            frames = timer.iterate("store", store.tee(frames))
+
+        def counted(frames):
+            for frame in frames:
+                stats['rows'] = stats.get('rows', 0) + len(frame)
+                yield frame
+
+        if export_current:
+            # Only the store file is missing; the export is up to date and stays untouched.
+            try:
+                deque(counted(frames), maxlen=0)
+                with timer.stage("store"):
+                    store.commit()
+            finally:
+                store.discard()
+            log(f"Export up to date, added to the trace store: {store_file}")
+            return "converted"
+
+        partial_file = f"{output_file}.partial"
+        try:
+            with timer.stage("write"):
+                write_frames(counted(frames), partial_file, output_format)
+            with timer.stage("hash"):
+                output_sha256 = file_sha256(partial_file)
+            stats['bytes_written'] = os.path.getsize(partial_file)
+            # The store is committed first: if that fails, the export is not moved into place either.
+            if store:
+                with timer.stage("store"):
+                    store.commit()
+            os.replace(partial_file, output_file)
+        finally:
+            if os.path.exists(partial_file):
+                os.unlink(partial_file)
+            if store:
+                store.discard()
+
+        with timer.stage("manifest"), closing(open_manifest(output_folder)) as manifest:
+            record_conversion(manifest, output_folder, output_file, mf4_file, source_stat, source_sha256,
+                              dbc_digest, settings, output_sha256)
+        log(f"Resampled data from {mf4_file} successfully exported to {output_file}")
+        return "converted"
+    except Exception as e:
+        log(f"Error processing {mf4_file}: {e}")
+        return "failed"
+    finally:
+        stats.update({f"{name}_s": seconds for name, seconds in timer.seconds.items()})
+        rss.stop()
+        stats['peak_rss_mib'] = rss.peak_mib
+
+
+def find_mf4_files(folder_path, output_folder):
+    """Walks folder_path for MF4 files, mirroring its sub-folders under output_folder."""
+    mf4_files = []
+    for root_dir, dirs, files in os.walk(folder_path):
+        for dir_name in dirs:
+            folder_output_path = os.path.join(output_folder, dir_name)
+            os.makedirs(folder_output_path, exist_ok=True)
+
+        mf4_files.extend([os.path.join(root_dir, file) for file in files if file.endswith('.mf4')])
+    return mf4_files
+
+
+def collect_inputs(input_path, output_folder):
+    """(mf4_files, input_root) for a single MF4 file or a folder searched with find_mf4_files."""
+    if os.path.isdir(input_path):
+        return find_mf4_files(input_path, output_folder), input_path
+    return [input_path], os.path.dirname(input_path)
+
+
+def convert_file(mf4_file, dbc_file, output_folder, raster, input_root, profile_dir=None, **options):
+    """Worker entry point: runs process_mf4 and returns (mf4_file, status, log messages, stats).
+
+    options are passed through to process_mf4 as keyword arguments. stats holds the
+    file, status, total seconds and process_mf4's per-stage statistics. With
+    profile_dir the conversion runs under cProfile and the profile is dumped
+    there; stats['profile'] is its path.
+    """
+    messages = []
+    stats = {'file': mf4_file}
+    profiler = cProfile.Profile() if profile_dir else None
+    start = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        try:
+            status = process_mf4(mf4_file, dbc_file, output_folder, raster, input_root,
+                                 log=messages.append, stats=stats, **options)
+        finally:
+            if profiler:
+                profiler.disable()
+    except Exception as e:
+        messages.append(f"Error processing {mf4_file}: {e}")
+        status = "failed"
+    stats.update(status=status, total_s=time.perf_counter() - start)
+
+    if profiler:
+        os.makedirs(profile_dir, exist_ok=True)
+        relative = os.path.splitdrive(os.path.abspath(mf4_file))[1].strip(os.sep)
+        stats['profile'] = os.path.join(profile_dir, relative.replace(os.sep, "__") + ".prof")
+        profiler.dump_stats(stats['profile'])
+    return mf4_file, status, messages, stats
+
+
+class BatchReport:
+    """Per-file statistics of a conversion batch, with rolling throughput and a timing report.
+
+    Throughput is measured over the last window completed files, so it follows
+    the current speed of the batch rather than its average since the start.
+    """
+
+    def __init__(self, total_files, window=20):
+        self.total_files = total_files
+        self.rows = []
+        self.start = time.perf_counter()
+        # (completion time, bytes read) of the most recent files
+        self.recent = deque([(self.start, 0)], maxlen=window + 1)
+
+    def add(self, stats):
+        self.rows.append(stats)
+        self.recent.append((time.perf_counter(), stats.get('bytes_read') or 0))
+
+    def throughput(self):
+        """(files per minute, MB read per second, seconds left) over the recent window."""
+        elapsed = self.recent[-1][0] - self.recent[0][0]
+        if len(self.recent) < 2 or elapsed <= 0:
+            return 0.0, 0.0, None
+        files = len(self.recent) - 1
+        megabytes = sum(size for _, size in list(self.recent)[1:]) / 1e6
+        remaining = (self.total_files - len(self.rows)) * elapsed / files
+        return files * 60 / elapsed, megabytes / elapsed, remaining
+
+    def progress_text(self):
+        files_per_min, mb_per_s, remaining = self.throughput()
+        eta = "--" if remaining is None else time.strftime('%H:%M:%S', time.gmtime(remaining))
+        return (f"{len(self.rows)}/{self.total_files} files, {files_per_min:.1f} files/min, "
+                f"{mb_per_s:.1f} MB/s, ETA {eta}")
+
+    def frame(self):
+        return pd.DataFrame(self.rows)
+
+    def write(self, report_file):
+        """Writes the per-file statistics as CSV, or as JSON if report_file ends in .json."""
+        if report_file.lower().endswith('.json'):
+            with open(report_file, 'w') as file:
+                json.dump(self.rows, file, indent=2)
+        else:
+            self.frame().to_csv(report_file, index=False)
+
+    def keep_slowest_profiles(self, keep):
+        """Deletes the cProfile dumps of all but the keep slowest files."""
+        profiled = sorted((row for row in self.rows if row.get('profile')), key=lambda row: row['total_s'],
+                          reverse=True)
+        for row in profiled[keep:]:
+            if os.path.exists(row['profile']):
+                os.unlink(row['profile'])
+            row['profile'] = None
+
+
+def _dbc_initargs(dbc_file):
+    # Parse the DBC once in the parent and hand the result to every worker. If it cannot be
+    # parsed, leave the workers unseeded so each file reports the DBC error in its own log.
+    try:
+        return _load_dbc_entry(dbc_file)
+    except Exception:
+        return None
+
+
+def _pool(workers, dbc_entry):
+    if dbc_entry is None:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_seed_dbc_cache, initargs=dbc_entry)
+
+
+def _convert_isolated(dbc_entry, mf4_file, *args, **options):
+    # Runs a single file in its own throwaway process so a hard crash only takes this file down.
+    with _pool(1, dbc_entry) as pool:
+        try:
+            return pool.submit(convert_file, mf4_file, *args, **options).result()
+        except BrokenProcessPool:
+            return (mf4_file, "failed", [f"Error processing {mf4_file}: worker process crashed"],
+                    {'file': mf4_file, 'status': "failed"})
+
+
+def convert_files(mf4_files, dbc_file, output_folder, raster, input_root, workers=None, **options):
+    """Converts mf4_files across a process pool, yielding convert_file results as they finish.
+
+    workers defaults to the number of CPUs and options are convert_file keyword
+    arguments (profile_dir, and process_mf4's save_decoded, output_format, chunk_rows, channels, ...). The DBC is filtered and parsed once here and the
+    parsed database is handed to each worker process when it starts.
+
+    Python exceptions are caught per file inside the worker; if a worker dies
+    outright (e.g. a native decoder crash) the files that were still pending are
+    re-run one per process afterwards, so only the culprit is reported as failed
+    and the rest of the batch still completes.
+    """
+    args = (dbc_file, output_folder, raster, input_root)
+    dbc_entry = _dbc_initargs(dbc_file)
+    crashed = []
+
+    with _pool(workers, dbc_entry) as pool:
+        futures = {pool.submit(convert_file, mf4_file, *args, **options): mf4_file for mf4_file in mf4_files}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                crashed.append(futures[future])
+
+    if crashed:
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+            yield from threads.map(lambda mf4_file: _convert_isolated(dbc_entry, mf4_file, *args, **options),
+                                  crashed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decode, resample and export MF4 recordings.")
+    parser.add_argument('input', help="MF4 file or folder searched recursively for .mf4 files")
+    parser.add_argument('--dbc', required=True, help="CAN database used to decode the bus logging")
+    parser.add_argument('--output', required=True, help="output folder (mirrors the input sub-folders)")
+    parser.add_argument('--raster', type=float, default=1.0, help="resampling raster in seconds")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="output format")
+    parser.add_argument('--chunk-rows', type=int, help="stream the export this many rows at a time")
+    parser.add_argument('--channels', nargs='+', default=[], metavar='PATTERN',
+                        help="signal names or glob patterns to keep (default: all)")
+    parser.add_argument('--channel-list', help="file with one signal name or pattern per line")
+    parser.add_argument('--save-decoded', action='store_true', help="also save the decoded MF4")
+    parser.add_argument('--store', help="also write every recording to this trace store folder")
+    parser.add_argument('--workers', type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument('--report', help="per-file stage timing report (.csv or .json)")
+    parser.add_argument('--profile-dir', help="run every file under cProfile and keep the dumps here")
+    parser.add_argument('--profile-keep', type=int, default=5, help="number of slowest files whose profiles are kept")
+    args = parser.parse_args(argv)
+
+    channels = args.channels + (read_channel_list(args.channel_list) if args.channel_list else [])
+    mf4_files, input_root = collect_inputs(args.input, args.output)
+    if not mf4_files:
+        print("No MF4 files found.")
+        return 1
+
+    statuses = []
+    report = BatchReport(len(mf4_files))
+    for mf4_file, status, messages, stats in convert_files(
+            mf4_files, args.dbc, args.output, args.raster, input_root, args.workers,
+            save_decoded=args.save_decoded, output_format=args.format, chunk_rows=args.chunk_rows,
+            channels=channels, store_folder=args.store, profile_dir=args.profile_dir):
+        for message in messages:
+            print(message)
+        statuses.append(status)
+        report.add(stats)
+        print(report.progress_text())
+
+    if args.profile_dir:
+        report.keep_slowest_profiles(args.profile_keep)
+    if args.report:
+        report.write(args.report)
+    print(f"{statuses.count('converted')} converted, {statuses.count('skipped')} skipped, "
+          f"{statuses.count('failed')} failed")
+    return 1 if 'failed' in statuses else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,304 @@
+"""Energy-consumption and range physics behind "Range calculator with GUI.py".
+
+Everything here works on whole columns at once, so a multi-hour 10 Hz drive
+cycle costs a handful of NumPy operations instead of a Python call per row.
+
+The module also runs headless batches: every workbook is evaluated against
+every parameter set in worker processes and the results are collected into
+one summary table.
+
+    python range_energy.py cycles/ --coefficients 36.078,0.1727,-0.0028 \
+        --vehicle-wt 138 --rider-wt 75 90 --battery 3965 --output summary.csv
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import interp1d  # type: ignore
+
+from batch import errors_last, expand_paths, report_errors
+
+# np.trapz was renamed to np.trapezoid in NumPy 2.0 and later removed.
+trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+
+def efficiency_curve(eff_table):
+    """Builds the linear, extrapolating efficiency-vs-speed curve from the Sheet3 table."""
+    speed_curve = eff_table.iloc[1:, 0].dropna().values.astype(float)
+    efficiency_curve = eff_table.iloc[1:, 1].dropna().values.astype(float)
+    return interp1d(speed_curve, efficiency_curve, kind='linear', fill_value="extrapolate")
+
+
+def p_corrected(timestamps, P, efficiency):
+    """Battery-side power for each sample.
+
+    Before 700 s the absolute wheel power is divided by the efficiency. After that,
+    regeneration (P < 0) is scaled by the efficiency, standstill (P == 0) draws a
+    fixed 32 W and traction power is divided by the efficiency.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(timestamps < 700, np.abs(P) / efficiency,
+                        np.where(P < 0, P * efficiency,
+                                 np.where(P == 0, 32, P / efficiency)))
+
+
+def calculate_energy(data, eff_table, a, b, c, vehicle_wt, rider_wt, battery_capacity):
+    """Runs the road-load and energy model over one drive cycle.
+
+    data is the Sheet1 cycle (timestamps, Speed_dyno in km/h) and eff_table the
+    Sheet3 efficiency table. Returns the processed DataFrame and a dict with Wh,
+    distance (m), WhperKm and range_km.
+    """
+    efficiency_interp = efficiency_curve(eff_table)
+
+    df = data.copy()
+    df['Speed_dyno_m/s'] = df['Speed_dyno'] / 3.6
+    df['dv/dt'] = np.gradient(df['Speed_dyno_m/s'], df['timestamps'])
+    df['dv/dt'] = df['dv/dt'].shift(1).fillna(0)
+
+    m = vehicle_wt + rider_wt
+    df['F'] = a + b * df['Speed_dyno'] + c * (df['Speed_dyno'] ** 2) + m * df['dv/dt']
+    df['P'] = df['F'] * df['Speed_dyno_m/s']
+    df['Efficiency'] = efficiency_interp(df['Speed_dyno'].values)
+    df['P_corrected'] = p_corrected(df['timestamps'].values, df['P'].values, df['Efficiency'].values)
+
+    integral_P_corrected = trapezoid(df['P_corrected'], df['timestamps'])
+    Wh = integral_P_corrected / 3600
+    distance = trapezoid(df['Speed_dyno_m/s'], df['timestamps'])
+    WhperKm = Wh / (distance / 1000)
+    range_km = battery_capacity / WhperKm
+
+    return df, {'Wh': Wh, 'distance': distance, 'WhperKm': WhperKm, 'range_km': range_km}
+
+
+def force_curve_png(df, a, b, c):
+    """PNG of the road-load force vs speed curve over the cycle's speed range, as bytes in a BytesIO."""
+    from io import BytesIO
+    # Figure without pyplot: no GUI backend is loaded, so reports render on headless machines.
+    from matplotlib.figure import Figure
+
+    speeds = np.linspace(df['Speed_dyno'].min(), df['Speed_dyno'].max(), 100)
+    forces = a + b * speeds + c * (speeds ** 2)
+
+    fig = Figure(figsize=(8, 5))
+    ax = fig.add_subplot()
+    ax.plot(speeds, forces, color='blue', linewidth=2)
+    ax.set_xlabel("Speed (km/h)")
+    ax.set_ylabel("Force (N)")
+    ax.set_title("Speed vs Force Curve")
+    ax.grid(True)
+
+    imgdata = BytesIO()
+    fig.savefig(imgdata, format='png')
+    imgdata.seek(0)
+    return imgdata
+
+
+def write_report(output_file_path, df, results, a, b, c, samples_format="Excel sheet"):
+    """Writes the summary workbook (with the force curve) and the per-sample data of one calculation.
+
+    samples_format is "Excel sheet" (a Processed Data sheet in the same workbook),
+    "Parquet file" or "CSV file" (written next to it as <name>_processed).
+    Returns the path the per-sample data went to.
+    """
+    imgdata = force_curve_png(df, a, b, c)
+    with pd.ExcelWriter(output_file_path, engine='xlsxwriter') as writer:
+        if samples_format == "Excel sheet":
+            df.to_excel(writer, sheet_name='Processed Data', index=False)
+
+        summary_data = pd.DataFrame({
+            'Metric': ['Total Energy Consumption (Wh)',
+                       'Total Distance (m)',
+                       'Energy Consumption (Wh/km)',
+                       'Estimated Range (km)'],
+            'Value': [results['Wh'], results['distance'], results['WhperKm'], results['range_km']]
+        })
+        summary_data.to_excel(writer, sheet_name='Summary', index=False, startrow=0)
+        writer.sheets['Summary'].insert_image('D6', 'speed_force_plot.png', {'image_data': imgdata})
+
+    # Writing the per-sample data outside Excel is far faster for long cycles
+    samples_path = os.path.splitext(output_file_path)[0] + "_processed"
+    if samples_format == "Parquet file":
+        samples_path += ".parquet"
+        df.to_parquet(samples_path, index=False)
+    elif samples_format == "CSV file":
+        samples_path += ".csv"
+        df.to_csv(samples_path, index=False)
+    else:
+        samples_path = output_file_path
+    return samples_path
+
+
+# Parsed workbooks: absolute path -> ((mtime_ns, size), Sheet1 data, Sheet3 efficiency table)
+_workbook_cache = {}
+
+
+def sidecar_paths(file_path):
+    """Parquet sidecar files holding the parsed Sheet1 and Sheet3 of a workbook."""
+    return f"{file_path}.Sheet1.parquet", f"{file_path}.Sheet3.parquet"
+
+
+def _read_sidecars(file_path, stamp):
+    import pyarrow.parquet as pq
+
+    paths = sidecar_paths(file_path)
+    for path in paths:
+        if not os.path.exists(path):
+            return None
+        metadata = pq.read_schema(path).metadata or {}
+        if metadata.get(b'workbook_stamp') != stamp:
+            return None
+    return tuple(pq.read_table(path).to_pandas() for path in paths)
+
+
+def _write_sidecars(file_path, stamp, data, eff_table):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Sheet3 mixes a units row with numbers; only its numeric values are used, so store those.
+    eff_table = eff_table.apply(pd.to_numeric, errors='coerce')
+    try:
+        for path, frame in zip(sidecar_paths(file_path), (data, eff_table)):
+            table = pa.Table.from_pandas(frame.rename(columns=str), preserve_index=False)
+            table = table.replace_schema_metadata({**table.schema.metadata, b'workbook_stamp': stamp})
+            pq.write_table(table, path)
+    except (pa.ArrowException, OSError):
+        # Sheets Parquet cannot represent (or a read-only folder): just go without the sidecar.
+        pass
+
+
+def load_workbook(file_path, sidecar=False):
+    """Reads the drive cycle (Sheet1) and efficiency table (Sheet3) from a workbook.
+
+    Parsed sheets are kept in memory until the workbook's mtime or size changes, so
+    recalculating with new coefficients does not parse the Excel file again. With
+    sidecar=True they are also persisted as Parquet next to the workbook and reused
+    in later sessions for as long as the workbook is unchanged.
+    """
+    stat = os.stat(file_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    key = os.path.abspath(file_path)
+
+    cached = _workbook_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
+
+    stamp_bytes = f"{stamp[0]}:{stamp[1]}".encode()
+    sheets = _read_sidecars(file_path, stamp_bytes) if sidecar else None
+    if sheets is None:
+        sheets = pd.read_excel(file_path, sheet_name=['Sheet1', 'Sheet3'])
+        sheets = sheets['Sheet1'], sheets['Sheet3']
+        if sidecar:
+            _write_sidecars(file_path, stamp_bytes, *sheets)
+
+    data, eff_table = sheets
+    _workbook_cache[key] = (stamp, data, eff_table)
+    return data, eff_table
+
+
+def load_cycle(file_path, speed_col, time_col='Timestamp'):
+    """Drive cycle (timestamps, Speed_dyno in km/h) taken from a recorded trace instead of Sheet1.
+
+    file_path is a CSV, Parquet or Feather trace such as a trace store recording;
+    only its time and speed columns are read.
+    """
+    from table_loader import load_columns
+
+    frame = load_columns(file_path, [time_col, speed_col], float32=False)
+    return pd.DataFrame({'timestamps': frame[time_col].values, 'Speed_dyno': frame[speed_col].values}).dropna()
+
+
+def parameter_grid(coefficients, vehicle_wts, rider_wts, battery_capacities):
+    """Every combination of (a, b, c) coefficient set, vehicle weight, rider weight and battery capacity."""
+    return [
+        {'a': a, 'b': b, 'c': c, 'vehicle_wt': vehicle_wt, 'rider_wt': rider_wt,
+         'battery_capacity': battery_capacity}
+        for (a, b, c), vehicle_wt, rider_wt, battery_capacity
+        in itertools.product(coefficients, vehicle_wts, rider_wts, battery_capacities)
+    ]
+
+
+def evaluate_workbook(file_path, parameter_sets, sidecar=False, report_dir=None):
+    """Reads one workbook once and evaluates it against every parameter set.
+
+    Returns one summary row per parameter set; if the workbook cannot be processed
+    a single row carrying the error message is returned instead. With report_dir,
+    the GUI's report workbook is also written there for every parameter set
+    (<workbook name>_<parameter set number>.xlsx).
+    """
+    try:
+        data, eff_table = load_workbook(file_path, sidecar)
+        rows = []
+        for number, parameters in enumerate(parameter_sets):
+            df, results = calculate_energy(data, eff_table, **parameters)
+            row = {'workbook': file_path, **parameters, **results}
+            if report_dir:
+                stem = os.path.splitext(os.path.basename(file_path))[0]
+                row['report'] = os.path.join(report_dir, f"{stem}_{number}.xlsx")
+                write_report(row['report'], df, results, parameters['a'], parameters['b'], parameters['c'])
+            rows.append(row)
+        return rows
+    except Exception as e:
+        return [{'workbook': file_path, 'error': str(e)}]
+
+
+def batch_calculate(workbooks, parameter_sets, workers=None, sidecar=False, report_dir=None):
+    """Evaluates every workbook against every parameter set across a process pool.
+
+    Each workbook is parsed once by one worker; workers defaults to the number of
+    CPUs, sidecar enables the Parquet sidecars of load_workbook and report_dir the
+    per-calculation report workbooks of evaluate_workbook. Returns the
+    consolidated summary as a DataFrame.
+    """
+    if report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for workbook_rows in pool.map(evaluate_workbook, workbooks, itertools.repeat(parameter_sets),
+                                  itertools.repeat(sidecar), itertools.repeat(report_dir)):
+            rows.extend(workbook_rows)
+
+    return errors_last(pd.DataFrame(rows))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch energy consumption and range calculation.")
+    parser.add_argument('workbooks', nargs='+', help="drive-cycle workbooks or folders of workbooks")
+    parser.add_argument('--coefficients', nargs='+', default=['36.078,0.1727,-0.0028'], metavar='A,B,C',
+                        help="coastdown coefficient sets")
+    parser.add_argument('--vehicle-wt', nargs='+', type=float, default=[138.0], help="vehicle weights (kg)")
+    parser.add_argument('--rider-wt', nargs='+', type=float, default=[75.0], help="rider weights (kg)")
+    parser.add_argument('--battery', nargs='+', type=float, default=[3965.0], help="battery capacities (Wh)")
+    parser.add_argument('--grid', help="CSV of explicit parameter sets with columns "
+                                       "a, b, c, vehicle_wt, rider_wt, battery_capacity (overrides the lists)")
+    parser.add_argument('--sidecar', action='store_true',
+                        help="cache parsed workbooks as Parquet sidecars next to them")
+    parser.add_argument('--reports', metavar='DIR',
+                        help="also write the GUI's report workbook for every calculation into DIR")
+    parser.add_argument('--workers', type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument('--output', default='range_summary.csv', help="summary table (.csv or .xlsx)")
+    args = parser.parse_args(argv)
+
+    if args.grid:
+        parameter_sets = pd.read_csv(args.grid).to_dict('records')
+    else:
+        coefficients = [tuple(float(value) for value in item.split(',')) for item in args.coefficients]
+        parameter_sets = parameter_grid(coefficients, args.vehicle_wt, args.rider_wt, args.battery)
+
+    workbooks = expand_paths(args.workbooks, '*.xlsx')
+    summary = batch_calculate(workbooks, parameter_sets, args.workers, args.sidecar, args.reports)
+
+    if args.output.lower().endswith('.xlsx'):
+        summary.to_excel(args.output, index=False)
+    else:
+        summary.to_csv(args.output, index=False)
+    print(f"{len(summary)} results for {len(workbooks)} workbooks written to {args.output}")
+
+    return 1 if report_errors(summary, 'workbook') else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
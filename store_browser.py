@@ -0,0 +1,50 @@
+"""Dialog for picking a recording from a trace store (see trace_store) in the GUIs."""
+import tkinter as tk
+from tkinter import filedialog, messagebox
+
+import pandas as pd
+
+from data_table import DataTable
+from trace_store import list_recordings
+
+
+def ask_recording(master, title="Open from Trace Store"):
+    """Asks for a store folder, lists its recordings and returns the file of the one picked, or None."""
+    store_folder = filedialog.askdirectory(title="Trace store folder")
+    if not store_folder:
+        return None
+    recordings = list_recordings(store_folder)
+    if not recordings:
+        messagebox.showinfo("Empty Store", f"No recordings are indexed in {store_folder}.")
+        return None
+
+    dialog = tk.Toplevel(master)
+    dialog.title(title)
+    listing = pd.DataFrame({
+        'Recording': [recording['path'] for recording in recordings],
+        'Rows': [recording['rows'] for recording in recordings],
+        'Duration (s)': [round((recording['time_end'] or 0) - (recording['time_start'] or 0), 1)
+                         for recording in recordings],
+        'Signals': [len(recording['signals']) for recording in recordings],
+        'Size (MiB)': [round(recording['size'] / 2 ** 20, 1) for recording in recordings],
+        'Source': [recording['source_file'] for recording in recordings],
+    })
+    table = DataTable(dialog, column_width=140)
+    table.pack(fill="both", expand=True)
+    table.show(listing)
+    tk.Label(dialog, text="Double-click a recording to open it.").pack(pady=5)
+
+    chosen = []
+
+    def on_double_click(event):
+        item = table.tree.identify_row(event.y)
+        if item:
+            # The table only holds the visible rows; map the clicked line back to the recording.
+            chosen.append(recordings[table.first + table.tree.index(item)]['file'])
+            dialog.destroy()
+
+    table.tree.bind("<Double-1>", on_double_click)
+    dialog.transient(master)
+    dialog.grab_set()
+    master.wait_window(dialog)
+    return chosen[0] if chosen else None
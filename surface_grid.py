@@ -0,0 +1,289 @@
+"""Time-windowed surface gridding behind "4D plot.py".
+
+SurfaceData sorts one recording by time once, so every slider position is a
+pair of binary searches instead of two boolean masks over the whole file, and
+keeps the most recently interpolated grids so revisiting a window is free.
+
+Three ways of turning a window into a surface are available (SurfaceData.method):
+
+* "griddata" - scipy.interpolate.griddata, triangulating the points every time.
+* "auto"     - points that already lie on a regular X/Y grid (motor maps,
+  torque/speed sweeps) are reshaped into it directly. Scattered points are
+  linearly interpolated like griddata, but the triangulation and the
+  barycentric weights of the output grid are cached per X/Y point set, so a
+  window whose operating points were seen before costs one weighted sum.
+* "binned"   - mean Z per cell of a resolution x resolution X/Y grid.
+
+For recordings too large to draw or triangulate point by point, SurfaceData also
+builds a level-of-detail pyramid at load time (see build_levels). Scatter plots
+and triangulations of a window use the finest level that keeps the window within
+point_budget points, so their cost stays bounded whatever the file size.
+
+Surfaces can also be computed without the viewer, e.g. for a whole recording on
+a compute node:
+
+    python surface_grid.py trace.csv --columns Time X Y Z --window 1.0 --output surfaces.npz
+"""
+import argparse
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.interpolate import griddata
+from scipy.spatial import Delaunay
+
+from table_loader import load_columns
+
+METHODS = ("auto", "griddata", "binned")
+
+# Points a window may hand to a scatter plot or triangulation before a coarser level is used
+POINT_BUDGET = 20000
+
+
+def regular_grid(X, Y, Z):
+    """Reshapes points lying on a full regular X/Y grid into (xi, yi, zi), or returns None.
+
+    Repeated samples of the same grid node are averaged.
+    """
+    ux, ix = np.unique(X, return_inverse=True)
+    uy, iy = np.unique(Y, return_inverse=True)
+    if len(ux) * len(uy) > len(X):
+        return None
+    node = iy * len(ux) + ix
+    counts = np.bincount(node, minlength=len(ux) * len(uy))
+    if not counts.all():
+        return None
+    zi = np.bincount(node, weights=Z, minlength=len(ux) * len(uy)) / counts
+    xi, yi = np.meshgrid(ux, uy)
+    return xi, yi, zi.reshape(len(uy), len(ux))
+
+
+def binned_grid(X, Y, Z, resolution):
+    """Mean Z in each cell of a resolution x resolution grid over the X/Y extent (NaN where empty)."""
+    x_edges = np.linspace(X.min(), X.max(), resolution + 1)
+    y_edges = np.linspace(Y.min(), Y.max(), resolution + 1)
+    ix = np.clip(np.searchsorted(x_edges, X, side='right') - 1, 0, resolution - 1)
+    iy = np.clip(np.searchsorted(y_edges, Y, side='right') - 1, 0, resolution - 1)
+    cell = iy * resolution + ix
+    counts = np.bincount(cell, minlength=resolution * resolution)
+    sums = np.bincount(cell, weights=Z, minlength=resolution * resolution)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zi = (sums / counts).reshape(resolution, resolution)
+    xi, yi = np.meshgrid((x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2)
+    return xi, yi, zi
+
+
+def triangulation_weights(X, Y, xi, yi):
+    """Delaunay-triangulates the X/Y points and locates every output grid node in it.
+
+    Returns (inside, vertices, weights): which grid nodes fall inside the convex
+    hull, and for those the three point indices and barycentric weights that make
+    up the linear interpolant - the same interpolant griddata(method='linear') evaluates.
+    """
+    tri = Delaunay(np.column_stack([X, Y]))
+    nodes = np.column_stack([xi.ravel(), yi.ravel()])
+    simplex = tri.find_simplex(nodes)
+    inside = simplex >= 0
+    transform = tri.transform[simplex[inside]]
+    bary = np.einsum('ijk,ik->ij', transform[:, :2], nodes[inside] - transform[:, 2])
+    weights = np.column_stack([bary, 1 - bary.sum(axis=1)])
+    return inside, tri.simplices[simplex[inside]], weights
+
+
+def merge_voxels(t, x, y, z, cell, weight, t0, bucket, n_cells):
+    """Weighted mean of the points sharing a (time bucket, X/Y cell) voxel, sorted by time.
+
+    Returns the merged t, x, y, z, cell and weight arrays, so the result can be merged again.
+    """
+    voxel = ((t - t0) // bucket).astype(np.int64) * n_cells + cell
+    keys, inverse = np.unique(voxel, return_inverse=True)
+    total = np.bincount(inverse, weights=weight)
+    means = [np.bincount(inverse, weights=values * weight) / total for values in (t, x, y, z)]
+    order = np.argsort(means[0], kind='stable')
+    return tuple(values[order] for values in (*means, keys % n_cells, total))
+
+
+def build_levels(t, x, y, z, xy_bins=128, min_points=1000, max_levels=12):
+    """Multi-resolution decimations of a time-sorted recording, finest first.
+
+    Level 0 is the recording itself. Each further level averages the points in
+    voxels of xy_bins x xy_bins X/Y cells and a time bucket four times longer than
+    the previous attempt, and is kept only if it at least halves the point count.
+    Building stops once a level has fewer than min_points points.
+    """
+    levels = [(t, x, y, z)]
+    valid = ~(np.isnan(x) | np.isnan(y) | np.isnan(z))
+    if valid.sum() <= min_points:
+        return levels
+    t, x, y, z = t[valid], x[valid], y[valid], z[valid]
+
+    # A voxel's mean stays inside its X/Y cell and the time buckets nest, so every
+    # level can be merged from the previous attempt instead of from the full recording.
+    x_edges = np.linspace(x.min(), x.max(), xy_bins + 1)
+    y_edges = np.linspace(y.min(), y.max(), xy_bins + 1)
+    ix = np.clip(np.searchsorted(x_edges, x, side='right') - 1, 0, xy_bins - 1)
+    iy = np.clip(np.searchsorted(y_edges, y, side='right') - 1, 0, xy_bins - 1)
+    merged = (t, x, y, z, iy * xy_bins + ix, np.ones(len(t)))
+
+    bucket = 4 * max(t[-1] - t[0], 1e-9) / len(t)
+    for _ in range(max_levels):
+        merged = merge_voxels(*merged, t[0], bucket, xy_bins * xy_bins)
+        if len(merged[0]) <= len(levels[-1][0]) / 2:
+            levels.append(merged[:4])
+            if len(merged[0]) < min_points:
+                break
+        bucket *= 4
+    return levels
+
+
+class SurfaceData:
+    def __init__(self, df, time_col, x_col, y_col, z_col, resolution=100, cache_size=64, method="auto",
+                 point_budget=POINT_BUDGET):
+        self.columns = (time_col, x_col, y_col, z_col)
+        self.resolution = resolution
+        self.point_budget = point_budget
+        self.cache_size = cache_size
+        self.method = method
+        self._grids = OrderedDict()
+        # X/Y point-set digest -> triangulation_weights result, for method "auto"
+        self._triangulations = OrderedDict()
+        # grid() is also called from playback worker threads
+        self._lock = threading.Lock()
+
+        t = df[time_col].to_numpy(dtype=float)
+        # Rows without a timestamp can never fall inside a window.
+        rows = np.flatnonzero(~np.isnan(t))
+        order = rows[np.argsort(t[rows], kind='stable')]
+        self.t = t[order]
+        self.x = df[x_col].to_numpy(dtype=float)[order]
+        self.y = df[y_col].to_numpy(dtype=float)[order]
+        self.z = df[z_col].to_numpy(dtype=float)[order]
+        self.levels = build_levels(self.t, self.x, self.y, self.z)
+
+    @property
+    def min_time(self):
+        return float(self.t[0])
+
+    @property
+    def max_time(self):
+        return float(self.t[-1])
+
+    def window(self, start, width, budget=None):
+        """X, Y and Z of the rows with start <= time <= start + width and no missing values.
+
+        With a budget the points come from the finest level of detail that has at
+        most that many points in the window (the coarsest level if none has).
+        """
+        for t, x, y, z in self.levels if budget else self.levels[:1]:
+            lo = np.searchsorted(t, start, side='left')
+            hi = np.searchsorted(t, start + width, side='right')
+            if budget is None or hi - lo <= budget:
+                break
+        x, y, z = x[lo:hi], y[lo:hi], z[lo:hi]
+        valid = ~(np.isnan(x) | np.isnan(y) | np.isnan(z))
+        return x[valid], y[valid], z[valid]
+
+    def grid(self, start, width):
+        """(xi, yi, zi) surface of a window using self.method, served from the LRU cache when possible."""
+        method = self.method
+        key = (round(start, 9), round(width, 9), method)
+        with self._lock:
+            if key in self._grids:
+                self._grids.move_to_end(key)
+                return self._grids[key]
+
+        # Binning and reshaping are linear in the point count and use every sample;
+        # triangulations get a decimated window once it exceeds the point budget.
+        X, Y, Z = self.window(start, width)
+        if method == "binned":
+            surface = binned_grid(X, Y, Z, self.resolution)
+        elif method == "auto":
+            surface = regular_grid(X, Y, Z) or self._cached_linear(*self.window(start, width, self.point_budget))
+        else:
+            X, Y, Z = self.window(start, width, self.point_budget)
+            xi = np.linspace(X.min(), X.max(), self.resolution)
+            yi = np.linspace(Y.min(), Y.max(), self.resolution)
+            xi, yi = np.meshgrid(xi, yi)
+            surface = xi, yi, griddata((X, Y), Z, (xi, yi), method='linear')
+
+        with self._lock:
+            self._grids[key] = surface
+            if len(self._grids) > self.cache_size:
+                self._grids.popitem(last=False)
+        return surface
+
+    def _cached_linear(self, X, Y, Z):
+        # Order the points so the same operating points give the same key whatever their time order.
+        order = np.lexsort((Y, X))
+        X, Y, Z = X[order], Y[order], Z[order]
+        key = hashlib.blake2b(X.tobytes() + Y.tobytes(), digest_size=16).digest()
+
+        xi = np.linspace(X.min(), X.max(), self.resolution)
+        yi = np.linspace(Y.min(), Y.max(), self.resolution)
+        xi, yi = np.meshgrid(xi, yi)
+
+        with self._lock:
+            cached = self._triangulations.get(key)
+            if cached is not None:
+                self._triangulations.move_to_end(key)
+        if cached is None:
+            cached = triangulation_weights(X, Y, xi, yi)
+            with self._lock:
+                self._triangulations[key] = cached
+                if len(self._triangulations) > self.cache_size:
+                    self._triangulations.popitem(last=False)
+
+        inside, vertices, weights = cached
+        zi = np.full(xi.size, np.nan)
+        zi[inside] = (Z[vertices] * weights).sum(axis=1)
+        return xi, yi, zi.reshape(xi.shape)
+
+
+def grid_windows(surface, starts, width, workers=None):
+    """Surfaces of the windows [start, start + width] for every start, computed across a thread pool.
+
+    Windows with too few points to interpolate give None.
+    """
+    def safe_grid(start):
+        try:
+            return surface.grid(start, width)
+        except (ValueError, RuntimeError):
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(safe_grid, starts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Interpolate time-windowed X/Y/Z surfaces of a recording.")
+    parser.add_argument('file', help="CSV, Parquet or Feather trace")
+    parser.add_argument('--columns', nargs=4, default=['Time', 'X', 'Y', 'Z'], metavar=('TIME', 'X', 'Y', 'Z'))
+    parser.add_argument('--window', type=float, default=1.0, help="window width in seconds")
+    parser.add_argument('--step', type=float, help="distance between window starts (default: the width)")
+    parser.add_argument('--method', choices=METHODS, default='auto')
+    parser.add_argument('--resolution', type=int, default=100, help="output grid size for scattered data")
+    parser.add_argument('--workers', type=int, help="interpolation threads")
+    parser.add_argument('--output', default='surfaces.npz',
+                        help="archive with starts, width and xi_<n>, yi_<n>, zi_<n> per window")
+    args = parser.parse_args(argv)
+
+    df = load_columns(args.file, args.columns, precise=args.columns[:1])
+    surface = SurfaceData(df, *args.columns, resolution=args.resolution, method=args.method)
+    starts = np.arange(surface.min_time, surface.max_time - args.window + 1e-9, args.step or args.window)
+    # Windows without enough points to interpolate are left out of the archive.
+    arrays = {'starts': [], 'width': args.window}
+    for start, grid in zip(starts, grid_windows(surface, starts, args.window, args.workers)):
+        if grid is None:
+            continue
+        n = len(arrays['starts'])
+        arrays['starts'].append(start)
+        arrays.update({f'xi_{n}': grid[0], f'yi_{n}': grid[1], f'zi_{n}': grid[2]})
+
+    np.savez_compressed(args.output, **arrays)
+    print(f"{len(arrays['starts'])} of {len(starts)} windows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
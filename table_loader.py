@@ -0,0 +1,135 @@
+"""Column-pruned loading of large traces for the GUIs.
+
+Converted MF4 recordings are CSVs with hundreds of signals, of which a tool
+plots a handful. read_header returns just the column names so dropdowns and
+column matching can be filled in without parsing any data; load_columns then
+reads only the columns actually needed, with the fastest available parser
+(pyarrow, else pandas' C engine), and stores floating-point columns as float32.
+
+With cache=True (and pyarrow installed) every column read from a CSV is also
+kept in an uncompressed Feather file next to it, stamped with the CSV's mtime
+and size. Later opens memory-map that file instead of parsing the CSV again;
+columns not cached yet are parsed once and added to it.
+
+Parquet and Feather files are read directly, also restricted to the requested columns.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+CACHE_SUFFIX = ".columns.feather"
+ARROW_FORMATS = {'.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+
+def csv_engine():
+    """"pyarrow" when pyarrow is installed, else pandas' C parser."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "c"
+    return "pyarrow"
+
+
+def read_header(file_path, encoding="utf-8"):
+    """Column names of a trace file, without reading any data rows."""
+    file_format = ARROW_FORMATS.get(os.path.splitext(file_path)[1].lower())
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(file_path).names
+    if file_format == 'feather':
+        import pyarrow as pa
+        with pa.memory_map(file_path) as source:
+            return pa.ipc.open_file(source).schema.names
+    return list(pd.read_csv(file_path, nrows=0, encoding=encoding).columns)
+
+
+def to_float32(frame, precise=()):
+    """Converts the float64 columns of frame to float32, except those named in precise."""
+    converted = {column: frame[column].astype(np.float32) for column in frame.columns
+                 if frame[column].dtype == np.float64 and column not in precise}
+    return frame.assign(**converted) if converted else frame
+
+
+def cache_path(file_path):
+    """The Feather column cache kept next to a CSV."""
+    return file_path + CACHE_SUFFIX
+
+
+def _stamp(file_path):
+    stat = os.stat(file_path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}".encode()
+
+
+def _read_csv(file_path, columns, encoding):
+    return pd.read_csv(file_path, usecols=columns, encoding=encoding, engine=csv_engine())[columns]
+
+
+def _read_cache(file_path, columns, stamp):
+    """(frame, complete): the requested columns if all are cached, else every cached column."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    path = cache_path(file_path)
+    if not os.path.exists(path):
+        return None, False
+    try:
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+        if (schema.metadata or {}).get(b'source_stamp') != stamp:
+            return None, False
+        if set(columns) <= set(schema.names):
+            return feather.read_table(path, columns=columns, memory_map=True).to_pandas(), True
+        # Read into memory rather than mapping it, since the file is about to be replaced.
+        return feather.read_table(path, memory_map=False).to_pandas(), False
+    except (pa.ArrowException, OSError):
+        return None, False
+
+
+def _write_cache(file_path, stamp, frame):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    path = cache_path(file_path)
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'source_stamp': stamp})
+        # Uncompressed, so later opens can memory-map the columns without decoding them.
+        feather.write_feather(table, path + ".partial", compression='uncompressed')
+        os.replace(path + ".partial", path)
+    except (pa.ArrowException, OSError):
+        # A read-only folder, or a cache still mapped by another open (Windows): go without it.
+        pass
+
+
+def load_columns(file_path, columns, float32=True, precise=(), cache=False, encoding="utf-8"):
+    """Reads only the given columns of a CSV, Parquet or Feather trace.
+
+    Float columns are returned as float32 unless float32 is False or they are
+    listed in precise (e.g. a long time axis that needs float64 resolution).
+    With cache=True, CSV columns are served from and added to the Feather cache.
+    """
+    columns = list(dict.fromkeys(columns))
+    file_format = ARROW_FORMATS.get(os.path.splitext(file_path)[1].lower())
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        frame = pq.read_table(file_path, columns=columns, memory_map=True).to_pandas()
+    elif file_format == 'feather':
+        import pyarrow.feather as feather
+        frame = feather.read_table(file_path, columns=columns, memory_map=True).to_pandas()
+    elif cache and csv_engine() == "pyarrow":
+        stamp = _stamp(file_path)
+        frame, complete = _read_cache(file_path, columns, stamp)
+        if not complete:
+            cached = frame if frame is not None else pd.DataFrame()
+            missing = [column for column in columns if column not in cached.columns]
+            frame = _read_csv(file_path, missing, encoding)
+            if not cached.empty:
+                frame = pd.concat([cached, frame], axis=1)
+            _write_cache(file_path, stamp, frame)
+            frame = frame[columns]
+    else:
+        frame = _read_csv(file_path, columns, encoding)
+
+    return to_float32(frame, precise) if float32 else frame
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The tools are top-level scripts rather than a package; make them (and the benchmark fixtures) importable.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
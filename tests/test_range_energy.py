@@ -0,0 +1,73 @@
+"""Pins the vectorized energy model of range_energy to the original row-wise implementation."""
+import numpy as np
+import pandas as pd
+from scipy.interpolate import interp1d  # type: ignore
+
+from range_energy import calculate_energy, trapezoid
+
+A, B, C = 36.078, 0.1727, -0.0028
+VEHICLE_WT, RIDER_WT, BATTERY = 138, 75, 3965
+
+
+def row_wise_energy(data, eff_table, a, b, c, vehicle_wt, rider_wt, battery_capacity):
+    """The calculation as "Range calculator with GUI.py" originally did it, one row at a time."""
+    speed_curve = eff_table.iloc[1:, 0].dropna().values.astype(float)
+    efficiency_curve = eff_table.iloc[1:, 1].dropna().values.astype(float)
+    efficiency_interp = interp1d(speed_curve, efficiency_curve, kind='linear', fill_value="extrapolate")
+
+    df = data.copy()
+    df['Speed_dyno_m/s'] = df['Speed_dyno'] / 3.6
+    df['dv/dt'] = np.gradient(df['Speed_dyno_m/s'], df['timestamps'])
+    df['dv/dt'] = df['dv/dt'].shift(1).fillna(0)
+
+    m = vehicle_wt + rider_wt
+    df['F'] = a + b * df['Speed_dyno'] + c * (df['Speed_dyno'] ** 2) + m * df['dv/dt']
+    df['P'] = df['F'] * df['Speed_dyno_m/s']
+    df['Efficiency'] = df['Speed_dyno'].apply(lambda v: float(efficiency_interp(v)))
+
+    def calculate_p_corrected(row):
+        if row['timestamps'] < 700:
+            return abs(row['P']) / row['Efficiency']
+        else:
+            if row['P'] < 0:
+                return row['P'] * row['Efficiency']
+            elif row['P'] == 0:
+                return 32
+            else:
+                return row['P'] / row['Efficiency']
+
+    df['P_corrected'] = df.apply(calculate_p_corrected, axis=1)
+
+    Wh = trapezoid(df['P_corrected'], df['timestamps']) / 3600
+    distance = trapezoid(df['Speed_dyno_m/s'], df['timestamps'])
+    WhperKm = Wh / (distance / 1000)
+    return df, {'Wh': Wh, 'distance': distance, 'WhperKm': WhperKm, 'range_km': battery_capacity / WhperKm}
+
+
+def drive_cycle():
+    """1 Hz cycle with accelerations, decelerations and stops both before and after 700 s."""
+    t = np.arange(1200, dtype=float)
+    speed = np.clip(30 + 25 * np.sin(t / 40) + 10 * np.sin(t / 7), 0, None)
+    speed[(t % 300) < 20] = 0
+    data = pd.DataFrame({'timestamps': t, 'Speed_dyno': speed})
+    eff_table = pd.DataFrame({'Speed': ['km/h'] + list(range(0, 101, 10)),
+                              'Efficiency': ['-'] + list(np.linspace(0.6, 0.88, 11))})
+    return data, eff_table
+
+
+def test_matches_row_wise_implementation():
+    data, eff_table = drive_cycle()
+    args = (A, B, C, VEHICLE_WT, RIDER_WT, BATTERY)
+    expected_df, expected = row_wise_energy(data, eff_table, *args)
+    df, results = calculate_energy(data, eff_table, *args)
+
+    # Every branch of the correction has to be exercised for the comparison to mean anything.
+    late = df['timestamps'] >= 700
+    assert (df['timestamps'] < 700).any()
+    assert (late & (df['P'] < 0)).any()
+    assert (late & (df['P'] == 0)).any()
+    assert (late & (df['P'] > 0)).any()
+
+    np.testing.assert_array_equal(df['P_corrected'].values, expected_df['P_corrected'].values.astype(float))
+    for key in ('Wh', 'distance', 'WhperKm', 'range_km'):
+        assert results[key] == expected[key], key
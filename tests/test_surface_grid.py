@@ -0,0 +1,57 @@
+"""Checks the "auto" surface method against scipy's griddata, which it is meant to reproduce."""
+import numpy as np
+import pandas as pd
+from scipy.interpolate import griddata
+
+from surface_grid import SurfaceData, regular_grid
+
+COLUMNS = ('Time', 'X', 'Y', 'Z')
+
+
+def recording(x, y, z):
+    return pd.DataFrame({'Time': np.arange(len(x), dtype=float), 'X': x, 'Y': y, 'Z': z})
+
+
+def test_scattered_windows_match_griddata():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 1, (300, 2)) * [6000, 250]
+    # The same operating points are visited twice with different Z, so the second
+    # window is interpolated from the cached triangulation of the first.
+    x, y = np.tile(points[:, 0], 2), np.tile(points[:, 1], 2)
+    z = np.sin(x / 2000) * np.cos(y / 100) + np.repeat([0.0, 0.5], len(points)) + rng.normal(0, 0.01, len(x))
+    df = recording(x, y, z)
+    auto = SurfaceData(df, *COLUMNS, resolution=40, method="auto")
+    reference = SurfaceData(df, *COLUMNS, resolution=40, method="griddata")
+
+    for start in (0.0, 300.0):
+        xi, yi, zi = auto.grid(start, len(points) - 1)
+        ref_xi, ref_yi, ref_zi = reference.grid(start, len(points) - 1)
+        np.testing.assert_array_equal(xi, ref_xi)
+        np.testing.assert_array_equal(yi, ref_yi)
+        assert np.isfinite(zi).any()
+        np.testing.assert_allclose(zi, ref_zi, rtol=1e-9, atol=1e-12, equal_nan=True)
+    assert len(auto._triangulations) == 1
+
+
+def test_gridded_window_matches_griddata():
+    rng = np.random.default_rng(1)
+    ux, uy = np.linspace(500, 6000, 12), np.linspace(10, 250, 8)
+    node_x, node_y = (values.ravel() for values in np.meshgrid(ux, uy))
+    node_z = np.sin(node_x / 2000) * np.cos(node_y / 100)
+    # Every node is sampled twice with noise, in random order, as a sweep would log it.
+    visits = rng.permutation(np.tile(np.arange(len(node_x)), 2))
+    z = node_z[visits] + rng.normal(0, 0.01, len(visits))
+    df = recording(node_x[visits], node_y[visits], z)
+
+    xi, yi, zi = SurfaceData(df, *COLUMNS, method="auto").grid(0.0, len(visits))
+    assert zi.shape == (len(uy), len(ux))
+
+    node_mean = np.bincount(visits, weights=z) / np.bincount(visits)
+    expected = griddata((node_x, node_y), node_mean, (xi, yi), method='linear')
+    np.testing.assert_allclose(zi, expected, rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+def test_regular_grid_rejects_incomplete_grids():
+    x, y = (values.ravel() for values in np.meshgrid(np.arange(4.0), np.arange(3.0)))
+    z = x + y
+    assert regular_grid(x[1:], y[1:], z[1:]) is None
@@ -0,0 +1,72 @@
+"""Converts a synthetic CAN recording into a trace store and reads it back through table_loader."""
+import os
+
+import pytest
+
+# mf4_converter imports asammdf at module level, so the skips must come before it is imported.
+pytest.importorskip("asammdf")
+pytest.importorskip("pyarrow")
+
+import numpy as np  # noqa: E402
+
+import fixtures  # noqa: E402
+from mf4_converter import process_mf4  # noqa: E402
+from table_loader import load_columns, read_header  # noqa: E402
+from trace_store import list_recordings, store_path  # noqa: E402
+
+
+@pytest.mark.parametrize("chunk_rows", [None, 7])
+def test_store_matches_export(tmp_path, chunk_rows):
+    input_folder, output_folder, store_folder = tmp_path / "logs", tmp_path / "csv", tmp_path / "store"
+    input_folder.mkdir()
+    dbc = str(tmp_path / "bus.dbc")
+    mf4 = str(input_folder / "bus.mf4")
+    fixtures.write_dbc(dbc)
+    fixtures.write_can_mf4(mf4, 3)
+
+    def convert():
+        return process_mf4(mf4, dbc, str(output_folder), 0.1, str(input_folder), chunk_rows=chunk_rows,
+                           store_folder=str(store_folder), log=lambda message: None)
+
+    assert convert() == "converted"
+    export = str(output_folder / "bus.csv")
+    recording = store_path(str(store_folder), "bus.csv")
+
+    recordings = list_recordings(str(store_folder))
+    assert [entry['file'] for entry in recordings] == [recording]
+    columns = read_header(export)
+    assert recordings[0]['signals'] == [name for name in columns if name != 'Timestamp']
+    assert recordings[0]['rows'] == len(load_columns(export, ['Timestamp'], float32=False))
+
+    expected = load_columns(export, columns, float32=False)
+    stored = load_columns(recording, columns, float32=False)
+    for name in columns:
+        np.testing.assert_allclose(stored[name].values, expected[name].values, rtol=1e-12, err_msg=name)
+
+    # A complete conversion is recognised as such; nothing is redone on the next run.
+    assert convert() == "skipped"
+    assert not os.path.exists(recording + ".partial")
+
+
+def test_enabling_store_keeps_export(tmp_path):
+    input_folder, output_folder, store_folder = tmp_path / "logs", tmp_path / "csv", tmp_path / "store"
+    input_folder.mkdir()
+    dbc = str(tmp_path / "bus.dbc")
+    mf4 = str(input_folder / "bus.mf4")
+    fixtures.write_dbc(dbc)
+    fixtures.write_can_mf4(mf4, 3)
+
+    def convert(**options):
+        return process_mf4(mf4, dbc, str(output_folder), 0.1, str(input_folder), log=lambda message: None,
+                           **options)
+
+    assert convert() == "converted"
+    export = output_folder / "bus.csv"
+    written = export.stat().st_mtime_ns
+
+    # Only the store file is produced; the up-to-date export is not rewritten.
+    assert convert(store_folder=str(store_folder)) == "converted"
+    assert export.stat().st_mtime_ns == written
+    assert os.path.exists(store_path(str(store_folder), "bus.csv"))
+    assert convert(store_folder=str(store_folder)) == "skipped"
+    assert convert() == "skipped"
@@ -0,0 +1,162 @@
+"""Columnar store of converted recordings, shared by the converter and the analysis tools.
+
+With a store folder the MF4 converter writes every recording a second time as
+an uncompressed Feather (Arrow IPC) file under the same relative path, while
+the CSV/Parquet export is being written. The tools open those files through
+table_loader, which memory-maps them and reads only the columns in use, so
+opening a recording does not parse anything.
+
+Each recording is listed in an SQLite index in the store folder (signals, their
+units, row count and time range), so a recording can be picked without opening
+its data:
+
+    python trace_store.py list store/
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+INDEX_NAME = ".trace_index.sqlite"
+STORE_SUFFIX = ".feather"
+
+
+def store_path(store_folder, relative_path):
+    """Feather file of the recording whose export is at relative_path inside the output folder."""
+    return os.path.join(store_folder, os.path.splitext(relative_path)[0] + STORE_SUFFIX)
+
+
+def open_index(store_folder):
+    """Opens (creating it if needed) the recording index of store_folder.
+
+    SQLite is used so that several converter worker processes can add recordings concurrently.
+    """
+    os.makedirs(store_folder, exist_ok=True)
+    index = sqlite3.connect(os.path.join(store_folder, INDEX_NAME), timeout=60)
+    with index:
+        index.execute(
+            "CREATE TABLE IF NOT EXISTS recordings ("
+            " path TEXT PRIMARY KEY, source_file TEXT, rows INTEGER, time_start REAL, time_end REAL,"
+            " signals TEXT, units TEXT, size INTEGER, written REAL)"
+        )
+    return index
+
+
+def list_recordings(store_folder):
+    """The index of store_folder as a list of dicts, skipping recordings whose file has gone."""
+    if not os.path.exists(os.path.join(store_folder, INDEX_NAME)):
+        return []
+    index = open_index(store_folder)
+    try:
+        rows = index.execute(
+            "SELECT path, source_file, rows, time_start, time_end, signals, units, size, written"
+            " FROM recordings ORDER BY path"
+        ).fetchall()
+    finally:
+        index.close()
+    recordings = []
+    for path, source_file, n_rows, time_start, time_end, signals, units, size, written in rows:
+        file_path = os.path.join(store_folder, path)
+        if os.path.exists(file_path):
+            recordings.append({'path': path, 'file': file_path, 'source_file': source_file, 'rows': n_rows,
+                               'time_start': time_start, 'time_end': time_end, 'signals': json.loads(signals),
+                               'units': json.loads(units), 'size': size, 'written': written})
+    return recordings
+
+
+class StoreWriter:
+    """Writes the frames of one recording to its Feather file and indexes it once complete.
+
+    Frames are passed through tee() on their way to the regular export, so the
+    recording is never built in memory a second time. The file is written under
+    a temporary name and only renamed into place and indexed by commit().
+    """
+
+    def __init__(self, store_folder, relative_path, source_file, units=None, time_column='Timestamp'):
+        self.store_folder = store_folder
+        self.path = store_path(store_folder, relative_path)
+        self.partial_path = self.path + ".partial"
+        self.source_file = source_file
+        self.units = units or {}
+        self.time_column = time_column
+        self.rows = 0
+        self.time_range = [None, None]
+        self._writer = None
+        self._sink = None
+        self._schema = None
+
+    def tee(self, frames):
+        """Yields frames unchanged, appending each one to the store file as it passes."""
+        import pyarrow as pa
+
+        for frame in frames:
+            # Later chunks are cast to the first chunk's schema, as the IPC file has a single one.
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._schema = table.schema
+                self._sink = pa.OSFile(self.partial_path, 'wb')
+                # Uncompressed, so readers can memory-map the columns without decoding them.
+                self._writer = pa.ipc.new_file(self._sink, table.schema,
+                                               options=pa.ipc.IpcWriteOptions(compression=None))
+            self._writer.write_table(table)
+            self.rows += len(frame)
+            if self.time_column in frame.columns and len(frame):
+                if self.time_range[0] is None:
+                    self.time_range[0] = float(frame[self.time_column].iloc[0])
+                self.time_range[1] = float(frame[self.time_column].iloc[-1])
+            yield frame
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = self._sink = None
+
+    def commit(self):
+        """Moves the finished file into place and adds (or replaces) its entry in the index."""
+        if self._writer is None:
+            return
+        signals = [name for name in self._schema.names if name != self.time_column]
+        self.close()
+        os.replace(self.partial_path, self.path)
+
+        index = open_index(self.store_folder)
+        try:
+            with index:
+                index.execute(
+                    "INSERT OR REPLACE INTO recordings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (os.path.relpath(self.path, self.store_folder), os.path.abspath(self.source_file), self.rows,
+                     self.time_range[0], self.time_range[1], json.dumps(signals),
+                     json.dumps({name: self.units.get(name, "") for name in signals}),
+                     os.path.getsize(self.path), time.time())
+                )
+        finally:
+            index.close()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.partial_path):
+            os.unlink(self.partial_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List the recordings of a trace store.")
+    parser.add_argument('command', choices=['list'])
+    parser.add_argument('store', help="store folder")
+    parser.add_argument('--signals', action='store_true', help="also print every signal and its unit")
+    args = parser.parse_args(argv)
+
+    for recording in list_recordings(args.store):
+        duration = (recording['time_end'] or 0) - (recording['time_start'] or 0)
+        print(f"{recording['path']}: {recording['rows']} rows, {len(recording['signals'])} signals, "
+              f"{duration:.1f} s, {recording['size'] / 2 ** 20:.1f} MiB")
+        if args.signals:
+            for signal in recording['signals']:
+                unit = recording['units'].get(signal)
+                print(f"    {signal}" + (f" [{unit}]" if unit else ""))
+
+
+if __name__ == "__main__":
+    main()